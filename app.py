@@ -2,9 +2,15 @@ import streamlit as st
 import plotly.graph_objects as go
 import time
 import math
+import numpy as np
 from config import Config
 from skills.collision_avoidance import CollisionAvoidanceSkill
+from skills.incremental_replanner import IncrementalReplanner
+from skills.geometric_planner import point_distances
 from simulator.vessel_mock import VesselMock
+from utils.trajectory import Path, circle_outline, circles_outline
+from utils.speculative import SpeculativeRunner
+from utils.chart_import import ChartImportError, import_chart
 
 # 页面配置
 st.set_page_config(page_title="海上作业任务规划智能体", layout="wide")
@@ -12,7 +18,9 @@ st.title("🚢 基于基础模型的海上作业任务规划智能体 (Phase 2)"
 
 # 初始化 Session State
 if 'vessel' not in st.session_state:
-    st.session_state.vessel = VesselMock(x=-50, y=-50)
+    st.session_state.vessel = VesselMock(x=-50, y=-50,
+                                         history_capacity=Config.HISTORY_CAPACITY,
+                                         history_decimation=Config.HISTORY_DECIMATION)
 if 'plan_result' not in st.session_state:
     st.session_state.plan_result = None
 if 'is_simulating' not in st.session_state:
@@ -21,6 +29,12 @@ if 'frame_count' not in st.session_state:
     st.session_state.frame_count = 0
 if 'safe_distance' not in st.session_state:
     st.session_state.safe_distance = 10.0
+if 'replanner' not in st.session_state:
+    st.session_state.replanner = None
+if 'speculative' not in st.session_state:
+    st.session_state.speculative = SpeculativeRunner(debounce=Config.SPECULATIVE_DEBOUNCE)
+if 'chart' not in st.session_state:
+    st.session_state.chart = None
 
 # 侧边栏：设置与输入
 with st.sidebar:
@@ -79,34 +93,116 @@ with st.sidebar:
             safe_radius = obs['radius'] + safe_distance
             st.caption(f"障碍物 {i + 1}: 中心 ({obs['x']}, {obs['y']}), 半径 {obs['radius']}m")
 
-    st.session_state.vessel.x = start_x
-    st.session_state.vessel.y = start_y
-    st.session_state.vessel.path_history = [(start_x, start_y)]
+    # 导入海图：流式解析 CSV / GeoJSON，经纬度投影到局部坐标并裁剪到作业区
+    st.subheader("🗺️ 导入海图")
+    chart_file = st.file_uploader(
+        "海图障碍物文件 (CSV / GeoJSON)",
+        type=['csv', 'geojson', 'json'],
+        key="chart_file",
+        help="CSV 表头为 lon,lat[,radius] 或 x,y[,radius]；GeoJSON 点要素取 radius 属性，线/面要素取外接圆"
+    )
+    origin_lon = st.number_input("局部坐标原点经度", value=Config.MAP_ORIGIN_LON, format="%.6f", key="origin_lon")
+    origin_lat = st.number_input("局部坐标原点纬度", value=Config.MAP_ORIGIN_LAT, format="%.6f", key="origin_lat")
+
+    chart_obstacles = np.empty((0, 3))
+    chart_key = None
+    if chart_file is not None:
+        chart_key = (chart_file.file_id, origin_lon, origin_lat)
+        chart = st.session_state.chart
+        if chart is None or chart['key'] != chart_key:
+            try:
+                circles, stats = import_chart(chart_file, origin=(origin_lon, origin_lat))
+                chart = {'key': chart_key, 'circles': circles, 'stats': stats, 'error': None}
+            except (ChartImportError, OSError) as e:
+                chart = {'key': chart_key, 'circles': np.empty((0, 3)), 'stats': None, 'error': str(e)}
+            st.session_state.chart = chart
+
+        if chart['error']:
+            st.error(f"❌ 海图导入失败：{chart['error']}")
+        else:
+            chart_obstacles = chart['circles']
+            stats = chart['stats']
+            source = "缓存" if stats['cached'] else f"共 {stats['total']} 个，跳过 {stats['skipped']} 条无效记录"
+            st.success(f"✅ 海图导入 {stats['kept']} 个作业区内障碍物（{source}）")
+    else:
+        st.session_state.chart = None
+
+    obstacles_info = [[obs['x'], obs['y'], obs['radius']] for obs in obstacles] + chart_obstacles.tolist()
+
+    # 增量重规划设置
+    st.subheader("🔁 仿真中增量重规划")
+    replan_enabled = st.checkbox(
+        "障碍物变化时自动重规划",
+        value=True,
+        key="replan_enabled",
+        help="仿真过程中修改障碍物后，只从船舶当前位置重新规划到下一个仍然有效的航点"
+    )
+    replan_horizon = st.slider(
+        "前视距离 (m)",
+        min_value=10.0,
+        max_value=100.0,
+        value=Config.REPLAN_HORIZON,
+        step=5.0,
+        key="replan_horizon",
+        disabled=not replan_enabled
+    )
+
+    # 仿真进行中保留船舶当前位置（障碍物修改会触发页面重跑）
+    if not st.session_state.is_simulating:
+        st.session_state.vessel.reset(start_x, start_y)
 
     st.header("💬 指令输入")
     user_cmd = st.text_input("自然语言指令", f"请规划一条安全路径到达终点，距障碍物边缘至少 {safe_distance}m。",
                              key="user_cmd")
 
+    def run_plan(cancel_event=None):
+        """按当前侧边栏输入执行规划（可在后台线程中运行）"""
+        skill = CollisionAvoidanceSkill()
+        return skill.plan(
+            start_pos=[start_x, start_y],
+            end_pos=[end_x, end_y],
+            obstacles=obstacles_info,
+            user_instruction=user_cmd,
+            safe_distance=safe_distance,
+            max_retries=5,
+            cancel_event=cancel_event
+        )
+
+    # 预测式后台规划：输入稳定后提前在后台规划，点击"生成规划"时直接取结果
+    speculative_enabled = st.checkbox(
+        "⚡ 预测式后台规划",
+        value=False,
+        key="speculative_enabled",
+        help=f"输入停止变化 {Config.SPECULATIVE_DEBOUNCE}s 后自动在后台开始规划，新的修改会取消过期的规划"
+    )
+    scenario_key = (start_x, start_y, end_x, end_y, tuple((obs['x'], obs['y'], obs['radius']) for obs in obstacles),
+                    chart_key, safe_distance, user_cmd)
+    if speculative_enabled and not st.session_state.is_simulating:
+        st.session_state.speculative.submit(scenario_key, run_plan)
+        spec_status = st.session_state.speculative.status(scenario_key)
+        if spec_status == SpeculativeRunner.DONE:
+            st.caption("⚡ 后台规划已完成，点击生成规划即可查看")
+        elif spec_status != SpeculativeRunner.IDLE:
+            st.caption("⚡ 后台规划进行中...")
+    elif not speculative_enabled:
+        st.session_state.speculative.cancel()
+
     if st.button("🔄 重新规划 (更换路径)", key="btn_replan"):
         st.session_state.plan_result = None
         st.session_state.is_simulating = False
+        st.session_state.replanner = None
         st.rerun()
 
     if st.button("🧠 生成规划", key="btn_plan"):
         with st.spinner(f"LLM 正在思考 (安全距离={safe_distance}m)..."):
-            skill = CollisionAvoidanceSkill()
-            obstacles_info = [[obs['x'], obs['y'], obs['radius']] for obs in obstacles]
-            result = skill.plan(
-                start_pos=[start_x, start_y],
-                end_pos=[end_x, end_y],
-                obstacles=obstacles_info,
-                user_instruction=user_cmd,
-                safe_distance=safe_distance,
-                max_retries=5
-            )
+            # 优先取回后台已完成或进行中的规划结果
+            result = st.session_state.speculative.take(scenario_key) if speculative_enabled else None
+            if result is None:
+                result = run_plan()
             st.session_state.plan_result = result
             st.session_state.is_simulating = False
             st.session_state.frame_count = 0
+            st.session_state.replanner = None
 
             if result.get('validation_status') == 'SAFE':
                 st.success(f"✅ 规划完成！路径已验证安全")
@@ -116,11 +212,19 @@ with st.sidebar:
                 st.error("❌ 规划失败")
 
     if st.button("▶️ 开始仿真演示", key="btn_simulate"):
-        if st.session_state.plan_result and 'waypoints' in st.session_state.plan_result:
+        # 规划失败/取消的结果没有航点，不能进入仿真（否则 is_simulating 无法复位）
+        if st.session_state.plan_result and st.session_state.plan_result.get('waypoints'):
             st.session_state.is_simulating = True
             st.session_state.frame_count = 0
+            st.session_state.replanner = IncrementalReplanner(
+                st.session_state.plan_result['waypoints'],
+                obstacles_info,
+                safe_distance=safe_distance,
+                horizon=replan_horizon
+            )
+            st.session_state.vessel.reset(start_x, start_y)
         else:
-            st.warning("请先生成规划！")
+            st.warning("请先生成有效的规划！")
 
     if st.button("⏹️ 停止仿真", key="btn_stop"):
         st.session_state.is_simulating = False
@@ -151,16 +255,10 @@ with col1:
                 waypoints = st.session_state.plan_result['waypoints']
 
                 all_safe = True
-                min_distances = []
-                for i, wp in enumerate(waypoints):
-                    wp_min_dist = float('inf')
-                    for obs in obstacles:
-                        if len(obs) >= 3:
-                            dist = math.sqrt((wp['x'] - obs['x']) ** 2 + (wp['y'] - obs['y']) ** 2) - obs['radius']
-                            if dist < wp_min_dist:
-                                wp_min_dist = dist
-                    min_distances.append(wp_min_dist)
-
+                circles = np.array(obstacles_info, dtype=np.float64).reshape(-1, 3)
+                edge_distances = point_distances(Path.from_dicts(waypoints).points, circles[:, :2]) - circles[:, 2]
+                min_distances = edge_distances.min(axis=1, initial=float('inf')).tolist()
+                for i, wp_min_dist in enumerate(min_distances):
                     if wp_min_dist < safe_dist:
                         st.error(f"⚠️ 航点{i}: 距边缘 {wp_min_dist:.1f}m < {safe_dist}m")
                         all_safe = False
@@ -176,6 +274,17 @@ with col1:
                     overall_min = min(min_distances)
                     st.metric("📏 路径最小安全距离", f"{overall_min:.1f}m")
 
+            replanner = st.session_state.replanner
+            if replanner is not None and replanner.events:
+                st.subheader("🔁 增量重规划记录")
+                for i, event in enumerate(replanner.events):
+                    if event['status'] == 'REPLANNED':
+                        st.info(f"#{i + 1} 位置 {event['position']}：绕行 {event['added_waypoints']} 个航点，"
+                                f"耗时 {event['latency_ms']:.1f}ms")
+                    else:
+                        reason = "附近障碍物过多，已放弃规划" if event.get('gave_up') else "无可行路径"
+                        st.error(f"#{i + 1} 位置 {event['position']}：{reason}，耗时 {event['latency_ms']:.1f}ms")
+
             with st.expander("📄 查看完整 JSON"):
                 st.json(st.session_state.plan_result)
     else:
@@ -205,9 +314,7 @@ with col2:
     # 1. 绘制圆形障碍物区域
     if obstacles:
         for i, obs in enumerate(obstacles):
-            theta = [j * 2 * math.pi / 50 for j in range(51)]
-            circle_x = [obs['x'] + obs['radius'] * math.cos(t) for t in theta]
-            circle_y = [obs['y'] + obs['radius'] * math.sin(t) for t in theta]
+            circle_x, circle_y = circle_outline(obs['x'], obs['y'], obs['radius'])
 
             fig.add_trace(go.Scatter(
                 x=circle_x, y=circle_y,
@@ -221,8 +328,7 @@ with col2:
             ))
 
             safe_radius = obs['radius'] + safe_dist
-            safe_x = [obs['x'] + safe_radius * math.cos(t) for t in theta]
-            safe_y = [obs['y'] + safe_radius * math.sin(t) for t in theta]
+            safe_x, safe_y = circle_outline(obs['x'], obs['y'], safe_radius)
 
             fig.add_trace(go.Scatter(
                 x=safe_x, y=safe_y,
@@ -235,13 +341,40 @@ with col2:
                 opacity=0.5
             ))
 
+    # 导入的海图障碍物数量可能很多，障碍物和安全区各合并为一条轨迹绘制
+    if len(chart_obstacles):
+        chart_x, chart_y = circles_outline(chart_obstacles)
+        fig.add_trace(go.Scatter(
+            x=chart_x, y=chart_y,
+            fill='toself',
+            fillcolor='rgba(139, 69, 19, 0.3)',
+            line=dict(color='saddlebrown', width=1),
+            name=f'海图障碍物 ({len(chart_obstacles)})',
+            mode='lines',
+            hoverinfo='name'
+        ))
+
+        safe_x, safe_y = circles_outline(chart_obstacles, offset=safe_dist)
+        fig.add_trace(go.Scatter(
+            x=safe_x, y=safe_y,
+            fill='toself',
+            fillcolor='rgba(255, 165, 0, 0.1)',
+            line=dict(color='orange', width=1, dash='dash'),
+            name='海图安全区',
+            mode='lines',
+            showlegend=False,
+            hoverinfo='skip',
+            opacity=0.5
+        ))
+
     # 2. 绘制规划路径
     if st.session_state.plan_result and 'waypoints' in st.session_state.plan_result:
         waypoints = st.session_state.plan_result['waypoints']
 
         if len(waypoints) > 0:
-            path_x = [p['x'] for p in waypoints]
-            path_y = [p['y'] for p in waypoints]
+            # 仿真中发生过增量重规划时，显示重规划后的路径
+            display_path = st.session_state.replanner.path if st.session_state.replanner else Path.from_dicts(waypoints)
+            path_x, path_y = display_path.x, display_path.y
 
             status = st.session_state.plan_result.get('validation_status', 'UNKNOWN')
             line_color = 'green' if status == 'SAFE' else ('orange' if status == 'RISKY' else 'red')
@@ -265,82 +398,108 @@ with col2:
             ))
 
             # 仿真动画
-            if st.session_state.is_simulating:
+            if st.session_state.is_simulating and st.session_state.replanner is not None:
                 vessel = st.session_state.vessel
+                replanner = st.session_state.replanner
+                replanner.horizon = replan_horizon
+                if replan_enabled:
+                    replanner.update_obstacles(obstacles_info)
                 plot_placeholder = st.empty()
                 progress_bar = st.progress(0)
+                event_placeholder = st.empty()
 
                 frame_count = 0
 
-                for i, target in enumerate(waypoints):
+                while not replanner.finished:
                     if not st.session_state.is_simulating:
                         break
 
-                    while True:
-                        reached = vessel.update_position(target['x'], target['y'], speed=1.0)
-
-                        # 复制基础图
-                        fig_ship = go.Figure(fig)
-
-                        # 更新船舶位置
-                        fig_ship.data[-1].x = [vessel.x]
-                        fig_ship.data[-1].y = [vessel.y]
-
-                        # 计算距离信息
-                        distances = []
-                        for obs in obstacles:
-                            dist_to_center = math.sqrt((vessel.x - obs['x']) ** 2 + (vessel.y - obs['y']) ** 2)
-                            dist_to_edge = dist_to_center - obs['radius']
-
-                            if dist_to_edge < safe_dist:
-                                status_icon = "⚠️"
-                            elif dist_to_edge < safe_dist * 1.5:
-                                status_icon = "⚡"
+                    # 前视范围内航段受阻时，从当前位置增量重规划
+                    if replan_enabled:
+                        event = replanner.check(vessel.x, vessel.y)
+                        if event is not None:
+                            fig.data[-2].x = replanner.path.x
+                            fig.data[-2].y = replanner.path.y
+                            if event['status'] == 'REPLANNED':
+                                event_placeholder.info(
+                                    f"🔁 已增量重规划：绕行 {event['added_waypoints']} 个航点，"
+                                    f"耗时 {event['latency_ms']:.1f}ms")
+                            elif event.get('gave_up'):
+                                event_placeholder.error("❌ 增量重规划失败：当前位置附近障碍物过多，已放弃规划")
                             else:
-                                status_icon = "✅"
-
-                            distances.append(f"{dist_to_edge:.1f}m{status_icon}")
-
-                        # 添加距离标注
-                        fig_ship.update_layout(
-                            annotations=[
-                                dict(
-                                    x=0.5, y=1.02,
-                                    xref='paper', yref='paper',
-                                    text=f"📍 ({vessel.x:.1f}, {vessel.y:.1f}) | 距障碍物：{' | '.join(distances)}",
-                                    showarrow=False,
-                                    font=dict(size=10, color='darkblue'),
-                                    bgcolor='rgba(255,255,255,0.9)',
-                                    bordercolor='blue',
-                                    borderwidth=1,
-                                    borderpad=4
-                                )
-                            ],
-                            transition=dict(duration=100),
-                            uirevision='constant'
-                        )
-
-                        # 渲染图表
-                        plot_placeholder.plotly_chart(
-                            fig_ship,
-                            use_container_width=True,
-                            key=f"ship_frame_{frame_count}",
-                            config={
-                                'displayModeBar': False,
-                                'displaylogo': False,
-                                'responsive': True,
-                                'scrollZoom': False
-                            }
-                        )
-                        frame_count += 1
-
-                        # 控制帧率
-                        time.sleep(0.15)
-
-                        if reached:
-                            break
-
-                    progress_bar.progress((i + 1) / len(waypoints))
+                                event_placeholder.error("❌ 增量重规划失败：当前位置附近无可行路径")
+
+                    target = replanner.current_target()
+                    reached = vessel.update_position(target[0], target[1], speed=1.0)
+
+                    # 复制基础图
+                    fig_ship = go.Figure(fig)
+
+                    # 更新船舶位置
+                    fig_ship.data[-1].x = [vessel.x]
+                    fig_ship.data[-1].y = [vessel.y]
+
+                    # 计算距离信息
+                    distances = []
+                    obstacles_nearby = obstacles
+                    if len(chart_obstacles):
+                        # 海图障碍物只标注最近的一个
+                        edge = np.hypot(chart_obstacles[:, 0] - vessel.x,
+                                        chart_obstacles[:, 1] - vessel.y) - chart_obstacles[:, 2]
+                        nearest = chart_obstacles[int(edge.argmin())]
+                        obstacles_nearby = obstacles + [{'x': nearest[0], 'y': nearest[1], 'radius': nearest[2]}]
+                    for obs in obstacles_nearby:
+                        dist_to_center = math.sqrt((vessel.x - obs['x']) ** 2 + (vessel.y - obs['y']) ** 2)
+                        dist_to_edge = dist_to_center - obs['radius']
+
+                        if dist_to_edge < safe_dist:
+                            status_icon = "⚠️"
+                        elif dist_to_edge < safe_dist * 1.5:
+                            status_icon = "⚡"
+                        else:
+                            status_icon = "✅"
+
+                        distances.append(f"{dist_to_edge:.1f}m{status_icon}")
+
+                    # 添加距离标注
+                    fig_ship.update_layout(
+                        annotations=[
+                            dict(
+                                x=0.5, y=1.02,
+                                xref='paper', yref='paper',
+                                text=f"📍 ({vessel.x:.1f}, {vessel.y:.1f}) | 距障碍物：{' | '.join(distances)}",
+                                showarrow=False,
+                                font=dict(size=10, color='darkblue'),
+                                bgcolor='rgba(255,255,255,0.9)',
+                                bordercolor='blue',
+                                borderwidth=1,
+                                borderpad=4
+                            )
+                        ],
+                        transition=dict(duration=100),
+                        uirevision='constant'
+                    )
+
+                    # 渲染图表
+                    plot_placeholder.plotly_chart(
+                        fig_ship,
+                        use_container_width=True,
+                        key=f"ship_frame_{frame_count}",
+                        config={
+                            'displayModeBar': False,
+                            'displaylogo': False,
+                            'responsive': True,
+                            'scrollZoom': False
+                        }
+                    )
+                    frame_count += 1
+
+                    # 控制帧率
+                    time.sleep(0.15)
+
+                    if reached:
+                        replanner.advance()
+                        progress_bar.progress(replanner.target_index / len(replanner.path))
 
                 st.session_state.is_simulating = False
                 st.success("仿真结束")
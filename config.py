@@ -14,12 +14,45 @@ class Config:
     # 组合成 LiteLLM 需要的格式
     LLM_MODEL = f"{LLM_PROVIDER}/{LLM_MODEL_NAME}"
 
+    # 备用模型（主模型熔断时切换），格式同 LLM_MODEL，留空则直接降级为几何规划
+    LLM_FALLBACK_MODEL = os.getenv("LLM_FALLBACK_MODEL", "")
+    LLM_FALLBACK_API_KEY = os.getenv("LLM_FALLBACK_API_KEY", None)
+    LLM_FALLBACK_BASE_URL = os.getenv("LLM_FALLBACK_BASE_URL", None)
+
+    # LLM 调用配置
+    LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "30"))  # 单次请求超时 (s)
+    LLM_MAX_ATTEMPTS = int(os.getenv("LLM_MAX_ATTEMPTS", "3"))  # 瞬时故障重试次数
+    LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))  # 退避基数 (s)
+    LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "8"))  # 退避上限 (s)
+    LLM_RATE_LIMIT = float(os.getenv("LLM_RATE_LIMIT", "1.0"))  # 令牌桶速率 (请求/秒)
+    LLM_RATE_BURST = int(os.getenv("LLM_RATE_BURST", "5"))  # 令牌桶容量
+    LLM_POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", "10"))  # HTTP 连接池大小
+    LLM_BREAKER_THRESHOLD = int(os.getenv("LLM_BREAKER_THRESHOLD", "5"))  # 连续失败多少次后熔断
+    LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))  # 熔断冷却时间 (s)
+    LLM_PROMPT_OBSTACLES = 30  # Prompt 中最多列出的障碍物数（距航线最近的优先）
+
     # 仿真配置
     SIMULATION_STEP = 0.5
     VESSEL_SPEED = 2.0
+    REPLAN_HORIZON = 30.0  # 增量重规划前视距离 (m)
+    HISTORY_CAPACITY = 5000  # 航迹历史环形缓冲区容量（点数）
+    HISTORY_DECIMATION = 1  # 航迹抽稀间隔（每 N 步记录一个点）
+
+    # 多目标任务规划配置
+    MISSION_WORKERS = int(os.getenv("MISSION_WORKERS", "4"))  # 航段代价并行线程数
+
+    # 界面配置
+    SPECULATIVE_DEBOUNCE = 1.0  # 预测式后台规划的去抖时间 (s)
 
     # 地图配置
     MAP_RANGE = 200
+    # 局部坐标原点（导入经纬度海图时的投影中心）
+    MAP_ORIGIN_LON = float(os.getenv("MAP_ORIGIN_LON", "0"))
+    MAP_ORIGIN_LAT = float(os.getenv("MAP_ORIGIN_LAT", "0"))
+
+    # 海图导入配置
+    CHART_CACHE_DIR = os.getenv("CHART_CACHE_DIR", ".chart_cache")  # 解析结果缓存目录
+    CHART_CHUNK_ROWS = 10000  # 流式解析每块的记录数
 
     @classmethod
     def print_config(cls):
@@ -1,5 +1,7 @@
 import math
 
+from utils.trajectory import Trajectory
+
 
 class VesselMock:
     """
@@ -7,11 +9,19 @@ class VesselMock:
     后续可替换为课题组提供的真实 3-DOF/6-DOF 模型类。
     """
 
-    def __init__(self, x=0, y=0, heading=0):
+    def __init__(self, x=0, y=0, heading=0, history_capacity=5000, history_decimation=1):
         self.x = x
         self.y = y
         self.heading = heading  # 航向角 (度)
-        self.path_history = [(x, y)]
+        # 航迹历史：定长环形缓冲区，长时间仿真内存占用恒定
+        self.path_history = Trajectory(capacity=history_capacity, decimation=history_decimation)
+        self.path_history.append(x, y)
+
+    def reset(self, x, y):
+        """将船舶放回 (x, y) 并清空航迹历史"""
+        self.x, self.y = x, y
+        self.path_history.clear()
+        self.path_history.append(x, y)
 
     def update_position(self, target_x, target_y, speed=1.0):
         """
@@ -23,6 +33,7 @@ class VesselMock:
 
         if dist < 0.5:  # 到达阈值
             self.x, self.y = target_x, target_y
+            self.path_history.append(self.x, self.y, force=True)
             return True  # 到达
 
         # 更新位置 (简化模拟，直接插值)
@@ -31,7 +42,7 @@ class VesselMock:
 
         # 更新航向
         self.heading = math.degrees(math.atan2(dy, dx))
-        self.path_history.append((self.x, self.y))
+        self.path_history.append(self.x, self.y)
         return False
 
     def get_state(self):
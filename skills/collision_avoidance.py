@@ -1,11 +1,16 @@
-from litellm import completion
 from config import Config
 from utils.json_parser import extract_json_from_text
+from utils.llm_client import LLMCancelledError, LLMRequestError, LLMUnavailableError, get_shared_client
+from utils.trajectory import Path
+from skills.geometric_planner import get_geometric_planner, point_distances, segment_distances
+import numpy as np
 import math
 
 
 class CollisionAvoidanceSkill:
-    def __init__(self):
+    def __init__(self, client=None):
+        # 默认使用进程内共享的 LLM 客户端（共享限流、熔断与连接池）
+        self.client = client if client is not None else get_shared_client()
         self.system_prompt = """
         你是一名专业的海上船舶任务规划智能体。
         你的任务是根据起点、终点和障碍物信息，规划一条安全的航路点 (Waypoints) 序列。
@@ -45,15 +50,20 @@ class CollisionAvoidanceSkill:
         4. 起点和终点必须包含在 waypoints 中
         """
 
-    def plan(self, start_pos, end_pos, obstacles, user_instruction, safe_distance=10.0, max_retries=5):
+    def plan(self, start_pos, end_pos, obstacles, user_instruction, safe_distance=10.0, max_retries=5,
+             cancel_event=None):
         """
         调用 LLM 进行路径规划（迭代直到生成安全路线）
 
         :param safe_distance: 距障碍物边缘的最小安全距离 (m)
+        :param cancel_event: 可选的 threading.Event，置位后放弃规划（后台预测式规划用）；
+                             LLM 客户端在每次请求前和退避等待期间都会检查
         """
-        # 格式化障碍物信息
+        # 格式化障碍物信息（障碍物很多时只列出距航线最近的一部分，验证仍针对全部障碍物）
+        prompt_indices = self._prompt_obstacle_indices(start_pos, end_pos, obstacles)
         obstacles_desc = []
-        for i, obs in enumerate(obstacles):
+        for i in prompt_indices:
+            obs = obstacles[i]
             if len(obs) >= 3:
                 min_safe_dist = obs[2] + safe_distance
                 obstacles_desc.append(
@@ -63,45 +73,67 @@ class CollisionAvoidanceSkill:
                 obstacles_desc.append(f"【障碍物{i + 1}】点 ({obs[0]}, {obs[1]})")
 
         # 计算障碍物之间的最小距离（帮助 LLM 理解密集程度）
-        obstacle_analysis = self._analyze_obstacles(obstacles, safe_distance)
+        obstacle_analysis = self._analyze_obstacles([obstacles[i] for i in prompt_indices], safe_distance,
+                                                    labels=[i + 1 for i in prompt_indices])
 
         attempt = 0
         last_validation_error = ""
+        fallback_reason = "LLM 未给出有效航点"  # 几何兜底时向用户说明的原因
         best_plan = None  # 保存最好的结果（即使不完全安全）
 
         while attempt < max_retries:
+            if cancel_event is not None and cancel_event.is_set():
+                return self._cancelled(safe_distance)
             attempt += 1
             print(f"🔄 规划尝试 {attempt}/{max_retries} (安全距离={safe_distance}m)")
 
             user_prompt = self._build_user_prompt(
                 start_pos, end_pos, obstacles_desc,
                 user_instruction, obstacle_analysis,
-                last_validation_error, attempt, safe_distance
+                last_validation_error, attempt, safe_distance,
+                total_obstacles=len(obstacles)
             )
 
             try:
-                response = completion(
-                    model=Config.LLM_MODEL,
+                content = self.client.complete(
                     messages=[
                         {"role": "system", "content": self.system_prompt},
                         {"role": "user", "content": user_prompt}
                     ],
-                    api_key=Config.LLM_API_KEY,
-                    api_base=Config.LLM_BASE_URL if Config.LLM_BASE_URL else None,
-                    temperature=0.1
+                    temperature=0.1,
+                    cancel_event=cancel_event
                 )
+            except LLMCancelledError:
+                return self._cancelled(safe_distance)
+            except LLMUnavailableError as e:
+                # 🔌 LLM 不可用（熔断/限流/超时），不再继续尝试，直接降级
+                last_validation_error = str(e)
+                fallback_reason = "LLM 暂不可用"
+                print(f"🔌 LLM 不可用：{last_validation_error}")
+                break
+            except LLMRequestError as e:
+                # ❌ 不可重试的请求错误（如鉴权失败），重发同样的请求没有意义
+                last_validation_error = str(e)
+                fallback_reason = f"LLM 请求错误（{last_validation_error}）"
+                print(f"❌ 规划错误：{last_validation_error}")
+                break
 
-                content = response.choices[0].message.content
-                plan_data = extract_json_from_text(content)
+            plan_data = extract_json_from_text(content or "")
 
-                if 'waypoints' not in plan_data or len(plan_data['waypoints']) == 0:
-                    last_validation_error = "规划结果为空"
-                    continue
+            # LLM 可能返回数组、null 等非对象 JSON
+            if not isinstance(plan_data, dict) or not isinstance(plan_data.get('waypoints'), list) \
+                    or len(plan_data['waypoints']) == 0:
+                last_validation_error = "规划结果为空"
+                continue
+            plan_data.setdefault('explanation', '')
+
+            try:
+                # 统一为 [{'x': float, 'y': float}, ...]（LLM 也可能返回 [[x, y], ...]）
+                path = Path.coerce(plan_data['waypoints'])
+                plan_data['waypoints'] = path.to_dicts()
 
                 # 验证路径（包括线段验证）
-                validation_result = self._validate_path_with_segments(
-                    plan_data['waypoints'], obstacles, safe_distance
-                )
+                validation_result = self._validate_path_with_segments(path, obstacles, safe_distance)
 
                 if validation_result['is_valid']:
                     # ✅ 验证通过，返回安全路线
@@ -124,10 +156,17 @@ class CollisionAvoidanceSkill:
                         if len(plan_data.get('waypoints', [])) > len(best_plan.get('waypoints', [])):
                             best_plan = plan_data
 
-            except Exception as e:
-                last_validation_error = str(e)
+            except (KeyError, TypeError, ValueError) as e:
+                # LLM 返回的航点格式不合法
+                last_validation_error = f"航点格式错误：{e}"
                 print(f"❌ 规划错误：{last_validation_error}")
 
+        # 没有拿到任何 LLM 结果时，使用几何规划器兜底
+        if best_plan is None:
+            fallback = self._geometric_fallback(start_pos, end_pos, obstacles, safe_distance, fallback_reason)
+            if fallback:
+                return fallback
+
         # 所有尝试都失败，返回最好的结果（带警告）
         if best_plan:
             best_plan[
@@ -144,10 +183,89 @@ class CollisionAvoidanceSkill:
                 'safe_distance': safe_distance
             }
 
+    @staticmethod
+    def _cancelled(safe_distance):
+        print("⏹️ 规划已取消")
+        return {
+            'error': '规划已取消',
+            'waypoints': [],
+            'explanation': '输入已变化，本次规划已取消',
+            'validation_status': 'CANCELLED',
+            'safe_distance': safe_distance
+        }
+
+    def plan_geometric(self, start_pos, end_pos, obstacles, safe_distance=10.0):
+        """
+        不调用 LLM，直接用几何规划器（可见图 + Dijkstra）生成路径
+
+        :return: 与 plan() 格式一致的结果；无可行路径（或航线附近障碍物过多而放弃）时 validation_status 为 'FAILED'
+        """
+        planner = get_geometric_planner(obstacles, safe_distance)
+        points, length = planner.shortest_path(start_pos, end_pos)
+        if points is None:
+            if math.isnan(length):
+                reason = f'航线附近障碍物超过 {planner.MAX_GRAPH_OBSTACLES} 个，已放弃规划（不代表不存在通路）'
+            else:
+                reason = f'起点或终点位于安全区内，或不存在距障碍物边缘 ≥ {safe_distance}m 的通路'
+            return {
+                'waypoints': [],
+                'explanation': f'几何规划失败：{reason}',
+                'validation_status': 'FAILED',
+                'safe_distance': safe_distance,
+                'planner': 'geometric'
+            }
+
+        waypoints = Path.from_points(points).to_dicts(3)
+        validation_result = self._validate_path_with_segments(waypoints, obstacles, safe_distance)
+        return {
+            'waypoints': waypoints,
+            'explanation': f"几何规划（可见图最短路径），距所有障碍物边缘 ≥ {safe_distance}m。",
+            'validation_status': 'SAFE' if validation_result['is_valid'] else 'RISKY',
+            'safe_distance': safe_distance,
+            'planner': 'geometric'
+        }
+
+    def _geometric_fallback(self, start_pos, end_pos, obstacles, safe_distance, reason="LLM 暂不可用"):
+        """
+        LLM 不可用或未给出任何航点时，用几何规划兜底
+
+        :param reason: 写入 explanation 的兜底原因
+        :return: 几何规划结果；几何规划也无解时返回 None
+        """
+        result = self.plan_geometric(start_pos, end_pos, obstacles, safe_distance)
+        if result['validation_status'] == 'FAILED':
+            return None
+
+        print(f"📐 使用几何规划兜底（{len(result['waypoints'])} 个航点，验证状态={result['validation_status']}）")
+        result['explanation'] = f"{reason}，已使用" + result['explanation']
+        return result
+
+    @staticmethod
+    def _prompt_obstacle_indices(start_pos, end_pos, obstacles, limit=None):
+        """
+        选出写入 Prompt 的障碍物下标：不超过 limit 个时全部保留，
+        否则取边缘距起点→终点连线最近的 limit 个（按原顺序）
+
+        :param limit: 默认 Config.LLM_PROMPT_OBSTACLES
+        """
+        limit = Config.LLM_PROMPT_OBSTACLES if limit is None else limit
+        if len(obstacles) <= limit:
+            return list(range(len(obstacles)))
+
+        circles = np.array([[obs[0], obs[1], obs[2] if len(obs) >= 3 else 0.0] for obs in obstacles],
+                           dtype=np.float64)
+        edge = segment_distances(start_pos[:2], end_pos[:2], circles[:, :2])[0] - circles[:, 2]
+        return sorted(np.argsort(edge, kind='stable')[:limit].tolist())
+
     def _build_user_prompt(self, start_pos, end_pos, obstacles_desc,
                            user_instruction, obstacle_analysis,
-                           last_validation_error, attempt, safe_distance):
+                           last_validation_error, attempt, safe_distance, total_obstacles=None):
         """构建用户 Prompt（包含迭代反馈）"""
+        if total_obstacles is None or total_obstacles == len(obstacles_desc):
+            obstacles_header = f"障碍物信息（共{len(obstacles_desc)}个，必须全部避开）："
+        else:
+            obstacles_header = (f"障碍物信息（海域内共{total_obstacles}个，以下为距航线最近的{len(obstacles_desc)}个，"
+                                f"必须全部避开）：")
 
         prompt = f"""当前任务：{user_instruction}
 起点坐标：{start_pos}
@@ -155,7 +273,7 @@ class CollisionAvoidanceSkill:
 
 ⚠️ 安全距离要求：**距所有障碍物边缘至少 {safe_distance}m**
 
-障碍物信息（共{len(obstacles_desc)}个，必须全部避开）：
+{obstacles_header}
 {chr(10).join(obstacles_desc)}
 
 障碍物分析：
@@ -182,10 +300,15 @@ class CollisionAvoidanceSkill:
 
         return prompt
 
-    def _analyze_obstacles(self, obstacles, safe_distance):
-        """分析障碍物分布情况"""
+    def _analyze_obstacles(self, obstacles, safe_distance, labels=None):
+        """
+        分析障碍物分布情况
+
+        :param labels: 障碍物编号（与 Prompt 中一致），默认 1..N
+        """
         if len(obstacles) < 2:
             return "单个障碍物，直接绕行即可"
+        labels = labels if labels is not None else list(range(1, len(obstacles) + 1))
 
         analysis = []
         for i in range(len(obstacles)):
@@ -199,14 +322,14 @@ class CollisionAvoidanceSkill:
                     min_gap = dist - obstacles[i][2] - obstacles[j][2] - 2 * safe_distance
                     if min_gap < 0:
                         analysis.append(
-                            f"- 障碍物{i + 1}与{j + 1}之间**无法通过**：安全边界间隙 {min_gap:.1f}m（**必须绕行**）")
+                            f"- 障碍物{labels[i]}与{labels[j]}之间**无法通过**：安全边界间隙 {min_gap:.1f}m（**必须绕行**）")
                     elif min_gap < 20:
                         analysis.append(
-                            f"- 障碍物{i + 1}与{j + 1}之间通道狭窄：安全边界间隙 {min_gap:.1f}m（**建议绕行**）")
+                            f"- 障碍物{labels[i]}与{labels[j]}之间通道狭窄：安全边界间隙 {min_gap:.1f}m（**建议绕行**）")
                     elif min_gap < 40:
-                        analysis.append(f"- 障碍物{i + 1}与{j + 1}之间通道宽度：安全边界间隙 {min_gap:.1f}m（谨慎通过）")
+                        analysis.append(f"- 障碍物{labels[i]}与{labels[j]}之间通道宽度：安全边界间隙 {min_gap:.1f}m（谨慎通过）")
                     else:
-                        analysis.append(f"- 障碍物{i + 1}与{j + 1}之间通道宽度：安全边界间隙 {min_gap:.1f}m（安全可通过）")
+                        analysis.append(f"- 障碍物{labels[i]}与{labels[j]}之间通道宽度：安全边界间隙 {min_gap:.1f}m（安全可通过）")
 
         return chr(10).join(analysis) if analysis else "障碍物分布较散"
 
@@ -214,45 +337,35 @@ class CollisionAvoidanceSkill:
         """
         验证路径（包括航点和航点之间的线段）
 
+        :param waypoints: 航点 dict 列表或 Path
         :param safe_distance: 距障碍物边缘的最小安全距离 (m)
         """
+        path = Path.coerce(waypoints)
+        circles = np.array([obs[:3] for obs in obstacles if len(obs) >= 3], dtype=np.float64).reshape(-1, 3)
+        if len(path) == 0 or len(circles) == 0:
+            return {'is_valid': True, 'message': ''}
+        centers, radii = circles[:, :2], circles[:, 2]
+
         # 1. 验证所有航点
-        for i, wp in enumerate(waypoints):
-            for obs in obstacles:
-                if len(obs) >= 3:
-                    obs_x, obs_y, radius = obs[0], obs[1], obs[2]
-                    dist_to_center = math.sqrt((wp['x'] - obs_x) ** 2 + (wp['y'] - obs_y) ** 2)
-                    dist_to_edge = dist_to_center - radius
-
-                    if dist_to_edge < safe_distance:
-                        return {
-                            'is_valid': False,
-                            'message': f"航点{i} ({wp['x']}, {wp['y']}) 距障碍物边缘仅 {dist_to_edge:.1f}m < {safe_distance}m！"
-                        }
+        edge = point_distances(path.points, centers) - radii
+        violated = edge < safe_distance
+        if violated.any():
+            i, j = np.argwhere(violated)[0]
+            x, y = path[i]
+            return {
+                'is_valid': False,
+                'message': f"航点{i} ({x}, {y}) 距障碍物边缘仅 {edge[i, j]:.1f}m < {safe_distance}m！"
+            }
 
         # 2. 验证航点之间的线段（关键！）
-        for i in range(len(waypoints) - 1):
-            wp1 = waypoints[i]
-            wp2 = waypoints[i + 1]
-
-            for obs in obstacles:
-                if len(obs) >= 3:
-                    obs_x, obs_y, radius = obs[0], obs[1], obs[2]
-
-                    # 计算线段到圆心的最短距离
-                    min_dist = self._point_to_segment_distance(
-                        obs_x, obs_y,
-                        wp1['x'], wp1['y'],
-                        wp2['x'], wp2['y']
-                    )
-
-                    dist_to_edge = min_dist - radius
-
-                    if dist_to_edge < safe_distance:
-                        return {
-                            'is_valid': False,
-                            'message': f"航点{i}到{i + 1}的连线距障碍物边缘仅 {dist_to_edge:.1f}m < {safe_distance}m！"
-                        }
+        edge = segment_distances(*path.segments(), centers) - radii
+        violated = edge < safe_distance
+        if violated.any():
+            i, j = np.argwhere(violated)[0]
+            return {
+                'is_valid': False,
+                'message': f"航点{i}到{i + 1}的连线距障碍物边缘仅 {edge[i, j]:.1f}m < {safe_distance}m！"
+            }
 
         return {'is_valid': True, 'message': ''}
 
@@ -0,0 +1,470 @@
+import heapq
+import math
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+def point_distances(points, centers):
+    """点到各圆心的距离矩阵，形状 (len(points), len(centers))"""
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    return np.hypot(points[:, None, 0] - centers[None, :, 0],
+                    points[:, None, 1] - centers[None, :, 1])
+
+
+def segment_distances(starts, ends, centers):
+    """线段到各圆心的最短距离矩阵，形状 (len(starts), len(centers))"""
+    a = np.asarray(starts, dtype=np.float64).reshape(-1, 2)
+    d = np.asarray(ends, dtype=np.float64).reshape(-1, 2) - a
+    centers = np.asarray(centers, dtype=np.float64).reshape(-1, 2)
+    length_sq = d[:, 0] ** 2 + d[:, 1] ** 2
+    length_sq[length_sq == 0] = 1.0
+
+    # 圆心在线段上的投影参数 t ∈ [0, 1]
+    dx, dy = d[:, 0, None], d[:, 1, None]
+    cx = centers[None, :, 0] - a[:, 0, None]
+    cy = centers[None, :, 1] - a[:, 1, None]
+    t = (cx * dx + cy * dy) / length_sq[:, None]
+    np.clip(t, 0.0, 1.0, out=t)
+    return np.hypot(cx - t * dx, cy - t * dy)
+
+
+class GeometricPlanner:
+    """
+    基于可见图 (Visibility Graph) 的几何避碰规划器，不依赖 LLM。
+    每个圆形障碍物按 "半径 + 安全距离" 膨胀后用外接正多边形近似，
+    多边形顶点之间互相可见的连线构成图，再用 Dijkstra 求最短路径。
+    最短路径只会经过两端都与所在多边形相切的连线（简化可见图），其余连线不做可见性检测，
+    图以邻接表存储。
+    障碍物较多（如导入的海图）时不构建整体可见图，而是只在与航线冲突的障碍物子集上规划，
+    用全部障碍物校验结果，把新发现的冲突障碍物加入子集后重新规划，直到路径安全。
+    子集超过 MAX_GRAPH_OBSTACLES 时放弃规划，长度记为 nan，与不可达（inf）区分。
+    """
+
+    # 外接多边形在膨胀圆之外再留出的相对余量，保证结果能通过严格的安全距离验证
+    MARGIN = 1.01
+    # 批量线段检测时每块的线段数（控制内存占用）
+    CHUNK_SIZE = 4096
+    # 超过该障碍物数时不构建整体可见图，改为按航线逐步扩展子集规划
+    MAX_GRAPH_OBSTACLES = 500
+    # 障碍物较多时线段按方向和空间位置分块检测：每块的线段数、方向分桶数
+    SPATIAL_CHUNK = 64
+    DIRECTION_BINS = 64
+    # 构建可见图时每块枚举的顶点对数（控制内存占用）
+    PAIR_BLOCK = 1 << 21
+
+    def __init__(self, obstacles, safe_distance=10.0, resolution=16):
+        """
+        :param obstacles: 障碍物列表 [[x, y, radius], ...]
+        :param safe_distance: 距障碍物边缘的最小安全距离 (m)
+        :param resolution: 每个障碍物外接多边形的顶点数
+        """
+        circles = [obs for obs in obstacles if len(obs) >= 3]
+        self.safe_distance = float(safe_distance)
+        self.resolution = int(resolution)
+        self.circles = np.array([c[:3] for c in circles], dtype=np.float64).reshape(-1, 3)
+        self.centers = np.ascontiguousarray(self.circles[:, :2])
+        self.clearance = self.circles[:, 2] + self.safe_distance
+
+        # 障碍物过多时不构建整体可见图，shortest_path 在冲突障碍物子集上规划
+        self.local = len(self.circles) > self.MAX_GRAPH_OBSTACLES
+        # 外接多边形半径；每个顶点所属障碍物及其径向单位向量，用于切线判断
+        self._radii = self.clearance * self.MARGIN / math.cos(math.pi / self.resolution)
+        self._tangent_cos = math.sin(math.pi / self.resolution) * (1 + 1e-9)
+        self._owner = np.empty(0, dtype=np.int64)
+        self._normals = np.empty((0, 2), dtype=np.float64)
+        if self.local:
+            self.nodes = np.empty((0, 2), dtype=np.float64)
+        else:
+            self.nodes = self._build_nodes()
+        # 邻接表：_adjacency[u] 为 [(相邻顶点, 边长), ...]
+        self._adjacency = self._build_graph()
+
+    def _build_nodes(self):
+        """生成所有障碍物外接多边形顶点，剔除落在其他障碍物安全区内的顶点"""
+        if len(self.centers) == 0:
+            return np.empty((0, 2), dtype=np.float64)
+
+        k = self.resolution
+        theta = np.arange(k) * (2 * math.pi / k)
+        unit = np.stack([np.cos(theta), np.sin(theta)], axis=1)
+        nodes = (self.centers[:, None, :] + self._radii[:, None, None] * unit[None, :, :]).reshape(-1, 2)
+        owner = np.repeat(np.arange(len(self.centers)), k)
+        normals = np.tile(unit, (len(self.centers), 1))
+
+        keep = self.points_clear(nodes)
+        self._owner, self._normals = owner[keep], normals[keep]
+        return nodes[keep]
+
+    def _tangent(self, index, origin):
+        """
+        判断 origin → 顶点 index 的连线是否为该顶点所在多边形的支撑线。
+        最短路径上的连线在其多边形顶点处必然相切；正多边形顶点处的支撑线与径向夹角的余弦不超过 sin(π/k)。
+        origin 落在该多边形内部（安全区外的边角）时不做判断。
+        """
+        owner = self._owner[index]
+        dx, dy = (self.nodes[index] - origin).T
+        cx, cy = (origin - self.centers[owner]).T
+        inside = np.hypot(cx, cy) < self._radii[owner]
+        normal = self._normals[index]
+        radial = np.abs(dx * normal[:, 0] + dy * normal[:, 1])
+        return inside | (radial <= np.hypot(dx, dy) * self._tangent_cos)
+
+    def _build_graph(self):
+        """构建顶点之间的可见边（只检测两端相切的连线），返回邻接表"""
+        n = len(self.nodes)
+        rows, cols = [np.empty(0, dtype=np.int64)], [np.empty(0, dtype=np.int64)]
+        if n >= 2:
+            # 按行分块枚举顶点对 (i < j)，先用稠密矩阵判断 i 端相切，再对剩余的连线判断 j 端
+            inside = (point_distances(self.nodes, self.centers) < self._radii[None, :]).T
+            x, y = self.nodes[:, 0], self.nodes[:, 1]
+            block = max(1, self.PAIR_BLOCK // n)
+            for s in range(0, n, block):
+                e = min(s + block, n)
+                dx, dy = x[None, :] - x[s:e, None], y[None, :] - y[s:e, None]
+                radial = np.abs(dx * self._normals[s:e, 0, None] + dy * self._normals[s:e, 1, None])
+                tangent = (radial <= np.hypot(dx, dy) * self._tangent_cos) | inside[self._owner[s:e]]
+                tangent &= np.arange(n)[None, :] > np.arange(s, e)[:, None]
+                r, c = np.nonzero(tangent)
+                r += s
+                tangent = self._tangent(c, self.nodes[r])
+                rows.append(r[tangent])
+                cols.append(c[tangent])
+
+        rows, cols = np.concatenate(rows), np.concatenate(cols)
+        visible = self.segments_clear(self.nodes[rows], self.nodes[cols])
+        rows, cols = rows[visible], cols[visible]
+        lengths = np.hypot(*(self.nodes[cols] - self.nodes[rows]).T)
+        adjacency = [[] for _ in range(n)]
+        for u, v, length in zip(rows.tolist(), cols.tolist(), lengths.tolist()):
+            adjacency[u].append((v, length))
+            adjacency[v].append((u, length))
+        return adjacency
+
+    def points_clear(self, points):
+        """批量判断点是否满足安全距离，返回布尔数组"""
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        if len(self.centers) == 0:
+            return np.ones(len(points), dtype=bool)
+
+        clear = np.empty(len(points), dtype=bool)
+        for s in range(0, len(points), self.CHUNK_SIZE):
+            dist = point_distances(points[s:s + self.CHUNK_SIZE], self.centers)
+            clear[s:s + self.CHUNK_SIZE] = np.all(dist >= self.clearance[None, :], axis=1)
+        return clear
+
+    def segments_clear(self, starts, ends):
+        """批量判断线段 starts[i]→ends[i] 是否与所有障碍物保持安全距离"""
+        starts = np.asarray(starts, dtype=np.float64).reshape(-1, 2)
+        ends = np.asarray(ends, dtype=np.float64).reshape(-1, 2)
+        if len(self.centers) == 0:
+            return np.ones(len(starts), dtype=bool)
+
+        clear = np.empty(len(starts), dtype=bool)
+        for idx, near in self._segment_chunks(starts, ends):
+            dist = segment_distances(starts[idx], ends[idx], self.centers[near])
+            clear[idx] = np.all(dist >= self.clearance[near][None, :], axis=1)
+        return clear
+
+    def _conflicts(self, starts, ends):
+        """与线段 starts[i]→ends[i] 中任意一段距离不足的障碍物，返回布尔数组（按障碍物）"""
+        starts = np.asarray(starts, dtype=np.float64).reshape(-1, 2)
+        ends = np.asarray(ends, dtype=np.float64).reshape(-1, 2)
+        conflict = np.zeros(len(self.centers), dtype=bool)
+        for idx, near in self._segment_chunks(starts, ends):
+            dist = segment_distances(starts[idx], ends[idx], self.centers[near])
+            conflict[near] |= np.any(dist < self.clearance[near][None, :], axis=0)
+        return conflict
+
+    def _segment_chunks(self, starts, ends):
+        """
+        线段分块，逐块给出 (线段下标, 需要检测的障碍物下标)。
+        障碍物较多时按方向、横向偏移和纵向位置排序后分小块，在该块方向的旋转坐标系下
+        只检测安全区与该块包围盒相交的障碍物。
+        """
+        if len(self.centers) <= self.SPATIAL_CHUNK:
+            for s in range(0, len(starts), self.CHUNK_SIZE):
+                yield slice(s, s + self.CHUNK_SIZE), slice(None)
+            return
+
+        step = math.pi / self.DIRECTION_BINS
+        cell = 2 * float(np.median(self.clearance))
+        d = ends - starts
+        bins = np.floor(np.mod(np.arctan2(d[:, 1], d[:, 0]), math.pi) / step).astype(np.int64)
+        ux, uy = np.cos((bins + 0.5) * step), np.sin((bins + 0.5) * step)
+        mid = (starts + ends) / 2
+        along = np.floor((mid[:, 0] * ux + mid[:, 1] * uy) / cell)
+        across = np.floor((mid[:, 1] * ux - mid[:, 0] * uy) / cell)
+        order = np.lexsort((along, across, bins))
+
+        for s in range(0, len(order), self.SPATIAL_CHUNK):
+            idx = order[s:s + self.SPATIAL_CHUNK]
+            frame = np.array([[ux[idx[0]], -uy[idx[0]]], [uy[idx[0]], ux[idx[0]]]])
+            points = np.concatenate([starts[idx], ends[idx]]) @ frame
+            centers = self.centers @ frame
+            near = np.all((centers + self.clearance[:, None] > points.min(axis=0))
+                          & (centers - self.clearance[:, None] < points.max(axis=0)), axis=1)
+            yield idx, np.flatnonzero(near)
+
+    def _shortest_path_local(self, start, end):
+        """
+        障碍物较多时的最短路径：先只考虑与直线航段冲突的障碍物，
+        规划结果若与其他障碍物冲突，则把这些障碍物加入子集重新规划。
+        子集无解则全集必然无解；子集超过 MAX_GRAPH_OBSTACLES 时放弃，返回 (None, nan)。
+        """
+        active = self._conflicts([start], [end])
+        while active.sum() <= self.MAX_GRAPH_OBSTACLES:
+            planner = get_geometric_planner(self.circles[active], self.safe_distance, self.resolution)
+            points, length = planner.shortest_path(start, end)
+            if points is None:
+                return None, math.inf
+
+            points_arr = np.asarray(points)
+            conflict = self._conflicts(points_arr[:-1], points_arr[1:]) & ~active
+            if not conflict.any():
+                return points, length
+            active |= conflict
+
+        print(f"⚠️ 几何规划：航线附近障碍物超过 {self.MAX_GRAPH_OBSTACLES} 个，放弃规划")
+        return None, math.nan
+
+    def _path_costs_local(self, sources, targets):
+        """
+        障碍物较多时的批量路径长度：先在所有起终点共享的障碍物子集上计算，
+        共享子集过大的起点再按各自的直线航段单独建子集。
+        """
+        costs = self._subset_costs(sources, targets)
+        if len(sources) > 1:
+            for i in np.flatnonzero(np.isnan(costs).any(axis=1)):
+                costs[i] = self._subset_costs(sources[i:i + 1], targets)[0]
+
+        # 仍然未知的航段中，直线可达的直接取直线距离
+        i, j = np.nonzero(np.isnan(costs))
+        direct = self.segments_clear(sources[i], targets[j])
+        costs[i[direct], j[direct]] = np.hypot(*(targets[j] - sources[i])[direct].T)
+        if not direct.all():
+            print(f"⚠️ 几何规划：航线附近障碍物超过 {self.MAX_GRAPH_OBSTACLES} 个，"
+                  f"{int((~direct).sum())} 个航段代价未知")
+
+        costs[~self.points_clear(sources)] = np.inf
+        costs[:, ~self.points_clear(targets)] = np.inf
+        return costs
+
+    def _subset_costs(self, sources, targets):
+        """
+        所有起终点直线航段的冲突障碍物合成一个子集，在子集可见图上每个起点只做一次 Dijkstra；
+        最短路径与子集外障碍物冲突时扩大子集重算。
+        子集超过 MAX_GRAPH_OBSTACLES 时放弃，子集上仍可达的航段记为 nan（未知，而非不可达）。
+        """
+        starts = np.repeat(sources, len(targets), axis=0)
+        ends = np.tile(targets, (len(sources), 1))
+        active = self._conflicts(starts, ends)
+        costs = np.full((len(sources), len(targets)), np.nan)
+        while active.sum() <= self.MAX_GRAPH_OBSTACLES:
+            planner = get_geometric_planner(self.circles[active], self.safe_distance, self.resolution)
+            costs, routes = planner._routes(sources, targets)
+            segments = [(a, b) for route in routes if route is not None for a, b in zip(route[:-1], route[1:])]
+            if not segments:
+                return costs
+            starts, ends = np.array(segments).transpose(1, 0, 2)
+            conflict = self._conflicts(starts, ends) & ~active
+            if not conflict.any():
+                return costs
+            active |= conflict
+
+        return np.where(np.isposinf(costs), np.inf, np.nan)
+
+    def _visibility_from(self, point):
+        """计算某点到所有图顶点的可见边权重"""
+        return self.visibility([point])[0]
+
+    def visibility(self, points):
+        """
+        批量计算多个点到所有图顶点的可见边权重
+
+        :return: 形状为 (len(points), len(nodes)) 的矩阵，不可见为 inf
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        n = len(self.nodes)
+        weights = np.full((len(points), n), np.inf)
+        if n == 0 or len(points) == 0:
+            return weights
+
+        # 只检测在顶点处相切的连线
+        p, v = np.divmod(np.arange(len(points) * n), n)
+        tangent = self._tangent(v, points[p])
+        p, v = p[tangent], v[tangent]
+        visible = self.segments_clear(points[p], self.nodes[v])
+        p, v = p[visible], v[visible]
+        weights[p, v] = np.hypot(*(self.nodes[v] - points[p]).T)
+        return weights
+
+    def _dijkstra(self, source_weights):
+        """邻接表 Dijkstra（二叉堆），返回 (各顶点距离, 前驱数组)；前驱 -1 表示直接来自源点"""
+        n = len(self.nodes)
+        dist = np.asarray(source_weights, dtype=np.float64).tolist()
+        prev = [-1] * n
+        done = [False] * n
+        heap = [(d, u) for u, d in enumerate(dist) if d < math.inf]
+        heapq.heapify(heap)
+
+        while heap:
+            d, u = heapq.heappop(heap)
+            if done[u]:
+                continue
+            done[u] = True
+            for v, length in self._adjacency[u]:
+                relaxed = d + length
+                if relaxed < dist[v]:
+                    dist[v] = relaxed
+                    prev[v] = u
+                    heapq.heappush(heap, (relaxed, v))
+
+        return np.array(dist), np.array(prev, dtype=np.int64)
+
+    def _trace(self, prev, last):
+        """根据前驱数组回溯顶点序列"""
+        chain = []
+        while last != -1:
+            chain.append(last)
+            last = int(prev[last])
+        chain.reverse()
+        return [(float(self.nodes[i][0]), float(self.nodes[i][1])) for i in chain]
+
+    def shortest_path(self, start, end):
+        """
+        求起点到终点的最短安全路径
+
+        :return: (航点坐标列表 [(x, y), ...], 路径长度)；无可行路径时返回 (None, inf)，
+                 障碍物过多放弃规划时返回 (None, nan)
+        """
+        start = (float(start[0]), float(start[1]))
+        end = (float(end[0]), float(end[1]))
+        if not self.points_clear([start, end]).all():
+            return None, math.inf
+
+        direct = math.hypot(end[0] - start[0], end[1] - start[1])
+        if self.segments_clear([start], [end])[0]:
+            return [start, end], direct
+        if self.local:
+            return self._shortest_path_local(start, end)
+        if len(self.nodes) == 0:
+            return None, math.inf
+
+        dist, prev = self._dijkstra(self._visibility_from(start))
+        total = dist + self._visibility_from(end)
+        last = int(np.argmin(total))
+        if not np.isfinite(total[last]):
+            return None, math.inf
+
+        return [start] + self._trace(prev, last) + [end], float(total[last])
+
+    def path_costs(self, sources, targets, source_weights=None, target_weights=None):
+        """
+        批量计算多个起点到多个终点的最短安全路径长度
+
+        :param source_weights: 可选，预先算好的 visibility(sources)（调用方缓存复用）
+        :param target_weights: 可选，预先算好的 visibility(targets)
+        :return: 形状为 (len(sources), len(targets)) 的矩阵，不可达为 inf，障碍物过多放弃规划为 nan
+        """
+        sources = np.asarray(sources, dtype=np.float64).reshape(-1, 2)
+        targets = np.asarray(targets, dtype=np.float64).reshape(-1, 2)
+        costs = np.full((len(sources), len(targets)), np.inf)
+        if len(sources) == 0 or len(targets) == 0:
+            return costs
+        if self.local:
+            return self._path_costs_local(sources, targets)
+
+        # 终点到图顶点的可见性只需计算一次: (len(targets), n)
+        if target_weights is None:
+            target_weights = self.visibility(targets)
+        if source_weights is None:
+            source_weights = self.visibility(sources)
+        source_ok = self.points_clear(sources)
+        target_ok = self.points_clear(targets)
+
+        for i, src in enumerate(sources):
+            if not source_ok[i]:
+                continue
+            direct_clear = self.segments_clear(np.repeat(src[None, :], len(targets), axis=0), targets)
+            direct = np.hypot(*(targets - src).T)
+            row = np.where(direct_clear & target_ok, direct, np.inf)
+
+            if len(self.nodes):
+                dist, _ = self._dijkstra(source_weights[i])
+                via_graph = np.min(dist[None, :] + target_weights, axis=1)
+                row = np.minimum(row, np.where(target_ok, via_graph, np.inf))
+            costs[i] = row
+
+        return costs
+
+    def _routes(self, sources, targets):
+        """
+        批量求多个起点到多个终点的最短路径（每个起点一次 Dijkstra）
+
+        :return: (代价矩阵, 按行展开的路径列表 [[(x, y), ...] 或 None, ...])
+        """
+        costs = np.full((len(sources), len(targets)), np.inf)
+        routes = [None] * (len(sources) * len(targets))
+        target_weights = self.visibility(targets)
+        source_ok = self.points_clear(sources)
+        target_ok = self.points_clear(targets)
+
+        for i, src in enumerate(sources):
+            if not source_ok[i]:
+                continue
+            direct_clear = self.segments_clear(np.repeat(src[None, :], len(targets), axis=0), targets)
+            direct = np.hypot(*(targets - src).T)
+            dist, prev = self._dijkstra(self._visibility_from(src))
+            total = dist[None, :] + target_weights
+            for j, dst in enumerate(targets):
+                if not target_ok[j]:
+                    continue
+                if direct_clear[j]:
+                    costs[i, j] = direct[j]
+                    routes[i * len(targets) + j] = [tuple(src), tuple(dst)]
+                    continue
+                last = int(np.argmin(total[j])) if len(self.nodes) else 0
+                if len(self.nodes) and np.isfinite(total[j, last]):
+                    costs[i, j] = total[j, last]
+                    routes[i * len(targets) + j] = [tuple(src)] + self._trace(prev, last) + [tuple(dst)]
+
+        return costs, routes
+
+    def plan(self, start_pos, end_pos):
+        """
+        规划航点序列（与 LLM 规划输出格式一致）
+
+        :return: [{'x': float, 'y': float}, ...]；无可行路径时返回空列表
+        """
+        points, _ = self.shortest_path(start_pos, end_pos)
+        if points is None:
+            return []
+        return [{'x': round(x, 3), 'y': round(y, 3)} for x, y in points]
+
+
+_planner_cache = OrderedDict()
+_planner_cache_lock = threading.Lock()
+_PLANNER_CACHE_SIZE = 32
+
+
+def get_geometric_planner(obstacles, safe_distance=10.0, resolution=16):
+    """按 (障碍物, 安全距离, 分辨率) 缓存 GeometricPlanner，避免重复构建可见图"""
+    key = (
+        tuple(tuple(float(v) for v in obs[:3]) for obs in obstacles if len(obs) >= 3),
+        float(safe_distance),
+        int(resolution),
+    )
+    with _planner_cache_lock:
+        planner = _planner_cache.get(key)
+        if planner is not None:
+            _planner_cache.move_to_end(key)
+            return planner
+
+    planner = GeometricPlanner(obstacles, safe_distance, resolution)
+    with _planner_cache_lock:
+        _planner_cache[key] = planner
+        while len(_planner_cache) > _PLANNER_CACHE_SIZE:
+            _planner_cache.popitem(last=False)
+    return planner
@@ -0,0 +1,191 @@
+import math
+import time
+
+import numpy as np
+
+from skills.geometric_planner import get_geometric_planner, segment_distances
+from utils.trajectory import Path
+
+
+class IncrementalReplanner:
+    """
+    仿真过程中的滚动时域 (Receding Horizon) 增量重规划器。
+    每一帧检查船舶前方 horizon 米内的剩余航段，一旦航段因障碍物变化而不再安全，
+    只从船舶当前位置重新规划到下一个仍然有效的航点，其余航点保持不变。
+    几何计算复用 get_geometric_planner 的缓存（同一组障碍物只构建一次可见图）。
+    新障碍物出现在船舶自身安全区内时，先沿远离障碍物的方向驶出安全区再绕行。
+    """
+
+    # 驶出安全区时在安全区边界外留出的相对余量
+    ESCAPE_MARGIN = 1.02
+
+    def __init__(self, waypoints, obstacles, safe_distance=10.0, horizon=30.0, retry_distance=2.0):
+        """
+        :param waypoints: 初始航点 [{'x': float, 'y': float}, ...] 或 Path
+        :param obstacles: 障碍物列表 [[x, y, radius], ...]
+        :param safe_distance: 距障碍物边缘的最小安全距离 (m)
+        :param horizon: 前视距离 (m)，只检查该距离内的剩余航段
+        :param retry_distance: 重规划失败后，障碍物不变时船舶至少移动多远 (m) 才再次尝试
+        """
+        self.path = Path.coerce(waypoints)
+        self.safe_distance = safe_distance
+        self.horizon = horizon
+        self.retry_distance = retry_distance
+        self.target_index = 0  # 船舶当前驶向的航点下标
+        self.events = []  # 每次重规划的记录（含耗时）
+        self.planner = None
+        self._failed_at = None  # 上次重规划失败时的 (障碍物几何, x, y)，用于节流重试
+        self.update_obstacles(obstacles)
+
+    def update_obstacles(self, obstacles):
+        """障碍物变化（新增/移动）后调用，几何结构按障碍物集合缓存"""
+        self.planner = get_geometric_planner(obstacles, self.safe_distance)
+
+    @property
+    def waypoints(self):
+        """当前航点（dict 列表格式）"""
+        return self.path.to_dicts()
+
+    @property
+    def finished(self):
+        return self.target_index >= len(self.path)
+
+    def current_target(self):
+        """当前目标航点 (x, y)，全部到达后返回 None"""
+        if self.finished:
+            return None
+        return self.path[self.target_index]
+
+    def advance(self):
+        """船舶到达当前目标航点后调用"""
+        self.target_index += 1
+
+    def _segments_ahead(self, x, y):
+        """
+        取出前视距离内的航段：(起点数组, 终点数组)，第 k 段的终点是航点 target_index + k
+        跨越前视边界的航段整段保留（保守检查）
+        """
+        ahead = self.path.points[self.target_index:]
+        starts = np.vstack([[x, y], ahead[:-1]])
+        travelled = np.cumsum(np.hypot(*(ahead - starts).T))
+        count = int(np.searchsorted(travelled, self.horizon)) + 1
+        return starts[:count], ahead[:count]
+
+    def check(self, x, y):
+        """
+        检查前视范围内的航段，必要时执行增量重规划
+
+        :param x: 船舶当前 x 坐标
+        :param y: 船舶当前 y 坐标
+        :return: 本帧触发重规划时返回事件记录 dict，否则返回 None
+        """
+        if self.finished or self._retry_throttled(x, y):
+            return None
+
+        starts, ends = self._segments_ahead(x, y)
+        clear = self.planner.segments_clear(starts, ends)
+        # 船舶已在安全区内、正沿驶离方向前往安全点时，第一段不视为受阻
+        if not clear[0] and self._leaves_safely(x, y, ends[0]):
+            clear[0] = True
+        if clear.all():
+            return None
+
+        blocked_end = self.target_index + int(clear.argmin())
+        return self._replan_from(x, y, blocked_end)
+
+    def _retry_throttled(self, x, y):
+        """上次重规划失败且障碍物未变化、船舶移动不足 retry_distance 时不再重复尝试"""
+        if self._failed_at is None:
+            return False
+        planner, fx, fy = self._failed_at
+        return planner is self.planner and np.hypot(x - fx, y - fy) < self.retry_distance
+
+    def _center_distances(self, x, y):
+        """船舶到各障碍物中心的距离"""
+        centers = self.planner.centers
+        return np.hypot(centers[:, 0] - x, centers[:, 1] - y)
+
+    def _leaves_safely(self, x, y, target):
+        """
+        船舶位于安全区内时，判断驶向 target 是否可接受：target 本身安全，
+        航段不进入其他安全区，且不会比当前位置更靠近船舶所在安全区的障碍物
+        """
+        current = self._center_distances(x, y)
+        inside = current < self.planner.clearance
+        if not inside.any() or not self.planner.points_clear([target])[0]:
+            return False
+        dist = segment_distances([x, y], target, self.planner.centers)[0]
+        return bool(np.all(np.where(inside, dist >= current - 1e-9, dist >= self.planner.clearance)))
+
+    def _escape_point(self, x, y):
+        """
+        船舶已在安全区内（如新障碍物出现在近旁）时，寻找驶出安全区的最近安全点：
+        候选为远离各侵入障碍物的径向出口，以及周围一圈逐步扩大的点
+
+        :return: (x, y)；找不到时返回 None
+        """
+        planner = self.planner
+        inside = self._center_distances(x, y) < planner.clearance
+        centers, clearance = planner.centers[inside], planner.clearance[inside] * self.ESCAPE_MARGIN
+
+        offset = np.array([x, y]) - centers
+        norm = np.hypot(offset[:, 0], offset[:, 1])
+        radial = centers[norm > 0] + offset[norm > 0] / norm[norm > 0, None] * clearance[norm > 0, None]
+
+        theta = np.arange(16) * (np.pi / 8)
+        ring = np.stack([np.cos(theta), np.sin(theta)], axis=1)
+        steps = np.linspace(0, 2 * clearance.max(), 9)[1:]
+        around = (np.array([x, y]) + steps[:, None, None] * ring[None, :, :]).reshape(-1, 2)
+
+        candidates = np.vstack([radial, around])
+        candidates = candidates[np.argsort(np.hypot(*(candidates - [x, y]).T), kind='stable')]
+        for point in candidates[planner.points_clear(candidates)]:
+            if self._leaves_safely(x, y, point):
+                return float(point[0]), float(point[1])
+        return None
+
+    def _replan_from(self, x, y, blocked_end):
+        """从当前位置规划到受阻航段之后第一个仍然有效（且可达）的航点"""
+        started = time.perf_counter()
+        event = {
+            'position': (round(x, 2), round(y, 2)),
+            'blocked_index': blocked_end,
+            'rejoin_index': None,
+            'added_waypoints': 0,
+            'status': 'FAILED',
+        }
+
+        # 船舶已在安全区内时先驶出安全区，再从安全点规划
+        start, escape = (x, y), []
+        if not self.planner.points_clear([start])[0]:
+            start = self._escape_point(x, y)
+            escape = [start] if start is not None else []
+
+        valid = self.planner.points_clear(self.path.points[blocked_end:])
+        rejoin = blocked_end + np.flatnonzero(valid) if start is not None else []
+        gave_up = False
+        for j in rejoin:
+            points, length = self.planner.shortest_path(start, self.path[j])
+            if points is None:
+                gave_up = gave_up or math.isnan(length)
+                continue
+
+            detour = escape + points[1:-1]
+            self.path = self.path.splice(self.target_index, j, detour)
+            event.update(rejoin_index=self.target_index + len(detour),
+                         added_waypoints=len(detour),
+                         status='REPLANNED')
+            break
+
+        event['latency_ms'] = (time.perf_counter() - started) * 1000
+        event['gave_up'] = event['status'] == 'FAILED' and gave_up
+        self.events.append(event)
+        self._failed_at = (self.planner, x, y) if event['status'] == 'FAILED' else None
+        if event['status'] == 'REPLANNED':
+            print(f"🔁 增量重规划：从 {event['position']} 绕行 {event['added_waypoints']} 个航点，"
+                  f"耗时 {event['latency_ms']:.1f}ms")
+        elif event['gave_up']:
+            print(f"❌ 增量重规划失败：{event['position']} 附近障碍物过多，已放弃规划")
+        else:
+            print(f"❌ 增量重规划失败：{event['position']} 附近无可行路径")
+        return event
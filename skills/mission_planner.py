@@ -0,0 +1,303 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from config import Config
+from skills.collision_avoidance import CollisionAvoidanceSkill
+from skills.geometric_planner import get_geometric_planner
+from utils.trajectory import Path
+
+# 不可达航段在排序时使用的代价（避免 inf 参与加减）
+UNREACHABLE_COST = 1e12
+
+
+def _point_key(point):
+    """航段缓存键：坐标取 6 位小数，避免浮点误差导致缓存失效"""
+    return round(float(point[0]), 6), round(float(point[1]), 6)
+
+
+def _route_cost(costs, route):
+    return float(costs[route[:-1], route[1:]].sum())
+
+
+def _nearest_neighbour(costs, start, end):
+    """最近邻构造初始访问顺序（首尾固定）"""
+    remaining = np.ones(len(costs), dtype=bool)
+    remaining[[start, end]] = False
+    route = [start]
+    while remaining.any():
+        candidates = np.flatnonzero(remaining)
+        nxt = int(candidates[np.argmin(costs[route[-1], candidates])])
+        route.append(nxt)
+        remaining[nxt] = False
+    route.append(end)
+    return np.array(route)
+
+
+def _two_opt(costs, route):
+    """2-opt：反转子序列消除交叉，返回是否有改进"""
+    improved = False
+    for i in range(1, len(route) - 2):
+        js = np.arange(i + 1, len(route) - 1)
+        a, b = route[i - 1], route[i]
+        c, e = route[js], route[js + 1]
+        delta = costs[a, c] + costs[b, e] - costs[a, b] - costs[c, e]
+        k = int(np.argmin(delta))
+        if delta[k] < -1e-9:
+            route[i:js[k] + 1] = route[i:js[k] + 1][::-1].copy()
+            improved = True
+    return improved
+
+
+def _or_opt(costs, route):
+    """Or-opt：把长度 1~3 的连续片段（可反向）移到更优的位置，返回 (新顺序, 是否有改进)"""
+    improved = False
+    for seg_len in (1, 2, 3):
+        i = 1
+        while i + seg_len < len(route):
+            first, last = route[i], route[i + seg_len - 1]
+            prev, nxt = route[i - 1], route[i + seg_len]
+            removed = costs[prev, first] + costs[last, nxt] - costs[prev, nxt]
+
+            rest = np.concatenate([route[:i], route[i + seg_len:]])
+            u, v = rest[:-1], rest[1:]
+            forward = costs[u, first] + costs[last, v] - costs[u, v]
+            backward = costs[u, last] + costs[first, v] - costs[u, v]
+            k_f, k_b = int(np.argmin(forward)), int(np.argmin(backward))
+
+            if min(forward[k_f], backward[k_b]) - removed < -1e-9:
+                segment = route[i:i + seg_len]
+                if backward[k_b] < forward[k_f]:
+                    k, segment = k_b, segment[::-1]
+                else:
+                    k = k_f
+                route = np.concatenate([rest[:k + 1], segment, rest[k + 1:]])
+                improved = True
+            i += 1
+    return route, improved
+
+
+def order_visits(costs, start=0, end=None, max_rounds=50):
+    """
+    用最近邻 + 2-opt + Or-opt 求访问顺序（对称代价矩阵）
+
+    :param costs: 航段代价矩阵，不可达为 inf
+    :param start: 起点下标（固定为第一个）
+    :param end: 终点下标（固定为最后一个），None 表示终点不限
+    :return: 访问顺序（节点下标列表）
+    """
+    n = len(costs)
+    costs = np.where(np.isfinite(costs), costs, UNREACHABLE_COST)
+    if end is None:
+        # 加一个到所有点代价为 0 的虚拟终点，把开放路径转化为首尾固定的问题
+        costs = np.pad(costs, ((0, 1), (0, 1)))
+        end = n
+
+    route = _nearest_neighbour(costs, start, end)
+    for _ in range(max_rounds):
+        improved = _two_opt(costs, route)
+        route, moved = _or_opt(costs, route)
+        if not (improved or moved):
+            break
+
+    return [int(i) for i in route if i < n]
+
+
+class MissionPlanner:
+    """
+    多目标任务规划（巡检、测量、补给等需要依次访问多个任务点的作业）。
+    先用几何规划器并行计算任务点之间考虑避障的航段代价（按坐标缓存），
+    再求访问顺序，最后通过 CollisionAvoidanceSkill 逐段规划并拼接航路。
+    """
+
+    def __init__(self, obstacles, safe_distance=10.0, skill=None, workers=None):
+        """
+        :param obstacles: 障碍物列表 [[x, y, radius], ...]
+        :param safe_distance: 距障碍物边缘的最小安全距离 (m)
+        :param skill: 逐段规划使用的 CollisionAvoidanceSkill，默认新建
+        :param workers: 并行线程数，默认 Config.MISSION_WORKERS
+        """
+        self.obstacles = obstacles
+        self.safe_distance = safe_distance
+        self.skill = skill if skill is not None else CollisionAvoidanceSkill()
+        self.workers = workers or Config.MISSION_WORKERS
+        self.geometry = get_geometric_planner(obstacles, safe_distance)
+        self._costs = {}  # (起点键, 终点键) -> 航段代价
+        self._visibility = {}  # 点键 -> 该点到可见图各顶点的边权重
+        self._legs = {}  # (起点键, 终点键, 是否使用 LLM) -> 航段规划结果
+
+    def leg_cost_matrix(self, points):
+        """
+        计算任务点两两之间的避障航段代价矩阵，已缓存的航段不重复计算
+
+        :return: 形状为 (len(points), len(points)) 的矩阵，不可达为 inf，
+                 几何规划器因障碍物过多放弃计算为 nan（代价未知，不代表不可达）
+        """
+        keys = [_point_key(p) for p in points]
+        unique = list(dict.fromkeys(keys))
+        # 只为新出现的点（以及缓存中仍有缺口的点）计算整行，列方向由对称性补齐
+        missing = [a for a in unique if (a, a) not in self._costs]
+        pending = set(missing)
+        missing += [a for a in unique if a not in pending
+                    and any((a, b) not in self._costs for b in unique if b not in pending)]
+
+        if missing:
+            new_points = [a for a in unique if a not in self._visibility]
+            if new_points:
+                self._visibility.update(zip(new_points, self.geometry.visibility(new_points)))
+            targets = np.array(unique)
+            target_weights = np.array([self._visibility[a] for a in unique])
+
+            def compute(chunk):
+                source_weights = np.array([self._visibility[a] for a in chunk])
+                return self.geometry.path_costs(chunk, targets, source_weights, target_weights)
+
+            chunks = [missing[i::self.workers] for i in range(min(self.workers, len(missing)))]
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                rows = list(pool.map(compute, chunks))
+
+            # 几何代价对称，同时写入正反两个方向
+            for chunk, chunk_rows in zip(chunks, rows):
+                for a, row in zip(chunk, chunk_rows.tolist()):
+                    for b, cost in zip(unique, row):
+                        self._costs[(a, b)] = cost
+                        self._costs[(b, a)] = cost
+
+        return np.array([[self._costs[(a, b)] for b in keys] for a in keys])
+
+    def _pin_endpoints(self, leg, start, end):
+        """
+        LLM 航段不一定以本段起终点开头和结尾：补上缺失的起终点后重新验证，
+        保证拼接时相邻航段首尾相接、不出现未经验证的跳跃
+        """
+        waypoints = leg.get('waypoints') or []
+        if not waypoints or leg.get('validation_status') == 'FAILED':
+            return leg
+
+        points = [(wp['x'], wp['y']) for wp in waypoints]
+        if _point_key(points[0]) != _point_key(start):
+            points.insert(0, start)
+        if _point_key(points[-1]) != _point_key(end):
+            points.append(end)
+        if len(points) == len(waypoints):
+            return leg
+
+        waypoints = [{'x': float(x), 'y': float(y)} for x, y in points]
+        validation = self.skill._validate_path_with_segments(waypoints, self.obstacles, self.safe_distance)
+        return {**leg, 'waypoints': waypoints,
+                'validation_status': 'SAFE' if validation['is_valid'] else 'RISKY'}
+
+    def _plan_leg(self, start, end, use_llm, user_instruction):
+        key = (_point_key(start), _point_key(end), use_llm)
+        leg = self._legs.get(key)
+        if leg is None:
+            if use_llm:
+                leg = self.skill.plan(list(start), list(end), self.obstacles, user_instruction,
+                                      safe_distance=self.safe_distance)
+                leg = self._pin_endpoints(leg, start, end)
+            else:
+                leg = self.skill.plan_geometric(list(start), list(end), self.obstacles, self.safe_distance)
+            self._legs[key] = leg
+        return leg
+
+    def plan(self, start_pos, task_points, end_pos=None, return_to_start=False,
+             use_llm=False, user_instruction="请规划一条安全路径到达终点。"):
+        """
+        规划访问所有任务点的完整航路
+
+        :param task_points: 任务点列表 [[x, y], ...]
+        :param end_pos: 固定终点，None 表示访问完最后一个任务点即结束
+        :param return_to_start: 是否返回起点（end_pos 为 None 时生效）
+        :param use_llm: 是否逐段调用 LLM 规划（默认直接使用几何规划）
+        :return: 与 plan() 格式兼容的结果，额外包含 order / unreachable / legs / total_length / timing_ms。
+                 从起点不可达的任务点不参与排序，列入 unreachable；代价未知的航段按直线距离参与排序；
+                 某一航段规划失败时航路在此截断，
+                 之后未访问的任务点同样列入 unreachable，返回的航点序列只包含已验证的航段
+        """
+        timing = {}
+        started = time.perf_counter()
+
+        if end_pos is None and return_to_start:
+            end_pos = start_pos
+        nodes = [tuple(start_pos)] + [tuple(p[:2]) for p in task_points]
+        if end_pos is not None:
+            nodes.append(tuple(end_pos))
+
+        costs = self.leg_cost_matrix(nodes)
+        timing['leg_costs'] = (time.perf_counter() - started) * 1000
+
+        # 几何代价对称，从起点可达的点彼此之间也可达；确定不可达 (inf) 的任务点不参与排序
+        last = len(nodes) - 1
+        keep = [i for i in range(len(nodes))
+                if i == 0 or not np.isposinf(costs[0, i]) or (end_pos is not None and i == last)]
+
+        # 代价未知 (nan) 的航段用直线距离（路径长度的下界）估计
+        points = np.array(nodes, dtype=np.float64)
+        straight = np.hypot(points[:, None, 0] - points[None, :, 0], points[:, None, 1] - points[None, :, 1])
+        costs = np.where(np.isnan(costs), straight, costs)
+
+        started = time.perf_counter()
+        route = order_visits(costs[np.ix_(keep, keep)], start=0,
+                             end=len(keep) - 1 if end_pos is not None else None)
+        route = [keep[i] for i in route]
+        timing['ordering'] = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        pairs = list(zip(route[:-1], route[1:]))
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            legs = list(pool.map(lambda pair: self._plan_leg(nodes[pair[0]], nodes[pair[1]],
+                                                             use_llm, user_instruction), pairs))
+        timing['legs'] = (time.perf_counter() - started) * 1000
+
+        # 拼接航段；遇到失败航段即截断，不拼接未经验证的跳跃
+        waypoints = [{'x': float(start_pos[0]), 'y': float(start_pos[1])}]
+        completed = 0
+        for leg in legs:
+            if leg.get('validation_status') == 'FAILED' or not leg.get('waypoints'):
+                break
+            waypoints.extend(leg['waypoints'][1:])
+            completed += 1
+        pairs, legs = pairs[:completed], legs[:completed]
+
+        visited = [b for _, b in pairs]
+        order = [i - 1 for i in visited if 1 <= i <= len(task_points)]
+        unreachable = sorted(set(range(len(task_points))) - set(order))
+        truncated = completed < len(route) - 1
+
+        # 拼接后的整条航路再验证一次，验证不通过时不报告为 SAFE
+        statuses = [leg.get('validation_status') for leg in legs]
+        validation = self.skill._validate_path_with_segments(waypoints, self.obstacles, self.safe_distance)
+        if truncated:
+            status = 'FAILED'
+        elif 'RISKY' in statuses or not validation['is_valid']:
+            status = 'RISKY'
+        else:
+            status = 'SAFE'
+
+        lengths = [Path.from_dicts(leg['waypoints']).length() for leg in legs]
+        total_length = sum(lengths)
+        print(f"🗺️ 多目标规划：{len(order)}/{len(task_points)} 个任务点，总航程 {total_length:.1f}m，"
+              f"耗时 {sum(timing.values()):.0f}ms")
+
+        explanation = (f"依次访问 {len(order)} 个任务点（顺序：{order}），"
+                       f"共 {len(legs)} 个航段，总航程 {total_length:.1f}m。")
+        if unreachable:
+            explanation += f" ⚠️ 任务点 {unreachable} 不可达，未纳入航路。"
+        if truncated:
+            explanation += f" ❌ 第 {completed + 1} 个航段规划失败，航路在此截断。"
+        if not validation['is_valid']:
+            explanation += f" ⚠️ 验证问题：{validation['message']}"
+
+        return {
+            'waypoints': waypoints,
+            'order': order,
+            'unreachable': unreachable,
+            'legs': [{'from': nodes[a], 'to': nodes[b], 'length': length, **leg}
+                     for (a, b), length, leg in zip(pairs, lengths, legs)],
+            'total_length': total_length,
+            'explanation': explanation,
+            'validation_status': status,
+            'safe_distance': self.safe_distance,
+            'timing_ms': timing
+        }
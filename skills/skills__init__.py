@@ -1,3 +1,7 @@
 from .collision_avoidance import CollisionAvoidanceSkill
+from .geometric_planner import GeometricPlanner, get_geometric_planner
+from .incremental_replanner import IncrementalReplanner
+from .mission_planner import MissionPlanner, order_visits
 
-__all__ = ['CollisionAvoidanceSkill']
+__all__ = ['CollisionAvoidanceSkill', 'GeometricPlanner', 'get_geometric_planner', 'IncrementalReplanner',
+           'MissionPlanner', 'order_visits']
@@ -0,0 +1,187 @@
+import io
+import json
+import time
+
+import numpy as np
+import pytest
+from config import Config
+from skills.collision_avoidance import CollisionAvoidanceSkill
+from skills.incremental_replanner import IncrementalReplanner
+from utils import chart_import
+from utils.chart_import import ChartImportError, import_chart, project
+from utils.trajectory import circles_outline
+
+
+class TestProjection:
+    """经纬度投影测试"""
+
+    def test_local_metres(self):
+        x, y = project([0.001, 120.0], [0.0, 30.001], 0.0, 0.0)
+        assert x[0] == pytest.approx(111.2, abs=0.1)
+        assert y[0] == pytest.approx(0.0)
+
+        x, y = project(120.001, 30.0, 120.0, 30.0)
+        assert float(x) == pytest.approx(111.2 * np.cos(np.radians(30.0)), abs=0.1)
+
+
+class TestImportChart:
+    """海图流式导入测试"""
+
+    def test_csv_lonlat_projected_and_clipped(self, tmp_path):
+        chart = tmp_path / "chart.csv"
+        chart.write_text("lon,lat,radius\n0.0002,0.0001,4\n-0.0002,0.0003,\n1.0,1.0,3\nbad,row,1\n")
+
+        circles, stats = import_chart(str(chart), origin=(0.0, 0.0), cache_dir=str(tmp_path / "cache"),
+                                      chunk_rows=2)
+
+        assert stats == {**stats, 'total': 3, 'kept': 2, 'skipped': 1, 'cached': False}
+        assert circles[0] == pytest.approx([22.24, 11.12, 4.0], abs=0.01)
+        assert circles[1, 2] == 5.0  # 缺失半径使用默认值
+
+    def test_cache_hit_is_memory_mapped(self, tmp_path):
+        chart = tmp_path / "chart.csv"
+        chart.write_text("x,y,radius\n0,0,15\n20,20,10\n")
+        first, _ = import_chart(str(chart), cache_dir=str(tmp_path))
+        second, stats = import_chart(str(chart), cache_dir=str(tmp_path))
+
+        assert stats['cached']
+        assert isinstance(second, np.memmap)
+        assert np.array_equal(first, second)
+
+        # 投影参数不同则不命中缓存
+        _, stats = import_chart(str(chart), origin=(1.0, 1.0), cache_dir=str(tmp_path))
+        assert not stats['cached']
+
+    def test_headerless_csv_file_object(self, tmp_path):
+        fh = io.BytesIO(b"0, 0, 15\n20, 20\n")
+        fh.name = "obstacles.csv"
+        circles, _ = import_chart(fh, cache_dir=str(tmp_path))
+        assert circles.tolist() == [[0.0, 0.0, 15.0], [20.0, 20.0, 5.0]]
+
+    def test_geojson_feature_collection_streamed(self, tmp_path, monkeypatch):
+        features = [{"type": "Feature", "geometry": {"type": "Point", "coordinates": [0.0001 * i, 0.0]},
+                     "properties": {"radius": 2}} for i in range(50)]
+        features.append({"type": "Feature", "properties": {},
+                         "geometry": {"type": "Polygon",
+                                      "coordinates": [[[0, 0], [0.0002, 0], [0.0002, 0.0002], [0, 0]]]}})
+        features.append({"type": "Feature", "geometry": None, "properties": {}})
+        chart = tmp_path / "chart.geojson"
+        chart.write_text(json.dumps({"type": "FeatureCollection", "name": "测试", "features": features}))
+
+        # 读取块远小于文件，验证增量解析
+        original = chart_import._iter_geojson_features
+        monkeypatch.setattr(chart_import, '_iter_geojson_features', lambda fh: original(fh, read_size=64))
+        circles, stats = import_chart(str(chart), origin=(0.0, 0.0), cache_dir=str(tmp_path))
+
+        assert stats['total'] == 51 and stats['skipped'] == 1
+        assert stats['kept'] == 11  # 与作业区相交的点 (i <= 9) 与面要素
+        polygon = circles[-1]
+        assert polygon[:2] == pytest.approx([11.12, 11.12], abs=0.01)
+        assert polygon[2] == pytest.approx(np.hypot(11.12, 11.12), abs=0.01)
+
+    def test_line_delimited_geojson(self, tmp_path):
+        lines = [json.dumps({"type": "Feature", "geometry": {"type": "Point", "coordinates": [x, 0]},
+                             "properties": {}}) for x in (10, 20)]
+        chart = tmp_path / "chart.geojsonl"
+        chart.write_text("\n".join(lines))
+
+        circles, _ = import_chart(str(chart), geographic=False, cache_dir=str(tmp_path))
+        assert circles.tolist() == [[10.0, 0.0, 5.0], [20.0, 0.0, 5.0]]
+
+    def test_unrecognised_input(self, tmp_path):
+        chart = tmp_path / "chart.csv"
+        chart.write_text("name,depth\nrock,3\n")
+        with pytest.raises(ChartImportError):
+            import_chart(str(chart), cache_dir=str(tmp_path))
+
+        chart = tmp_path / "broken.geojson"
+        chart.write_text('{"type": "FeatureCollection", "features": [{"type": "Feature"')
+        with pytest.raises(ChartImportError):
+            import_chart(str(chart), cache_dir=str(tmp_path))
+
+        chart = tmp_path / "binary.csv"
+        chart.write_bytes(b"x,y\n\xff\xfe,1\n")
+        with pytest.raises(ChartImportError):
+            import_chart(str(chart), cache_dir=str(tmp_path))
+
+    def test_malformed_features_are_skipped(self, tmp_path):
+        geometries = [{"type": "Point", "coordinates": c} for c in ([[1]], ["a", "b"], "xx", [3, 4])]
+        geometries += ["x", {"type": "GeometryCollection", "geometries": [1]}]
+        features = [{"type": "Feature", "geometry": g, "properties": {}} for g in geometries] + [5]
+        chart = tmp_path / "chart.geojson"
+        chart.write_text(json.dumps({"type": "FeatureCollection", "features": features}))
+
+        circles, stats = import_chart(str(chart), geographic=False, cache_dir=str(tmp_path))
+        assert circles.tolist() == [[3.0, 4.0, 5.0]]
+        assert stats['skipped'] == 6
+
+    def test_cache_write_failure_is_not_fatal(self, tmp_path):
+        chart = tmp_path / "chart.csv"
+        chart.write_text("x,y,radius\n0,0,15\n1,1,-2\n")
+        blocker = tmp_path / "cache"
+        blocker.write_text("")  # 同名文件导致无法创建缓存目录
+
+        circles, stats = import_chart(str(chart), cache_dir=str(blocker))
+        assert circles.tolist() == [[0.0, 0.0, 15.0]]
+        assert stats['cache_path'] is None and stats['skipped'] == 1
+
+
+class TestLargeChart:
+    """约 1 万个障碍物的海图直接用于规划与增量重规划"""
+
+    @pytest.fixture
+    def chart(self, tmp_path):
+        rng = np.random.default_rng(0)
+        lon, lat = rng.uniform(-0.009, 0.009, (2, 10000))
+        radius = rng.uniform(1, 3, 10000)
+        path = tmp_path / "chart.csv"
+        with open(path, 'w') as fh:
+            fh.write("lon,lat,radius\n")
+            fh.writelines(f"{a:.7f},{b:.7f},{r:.2f}\n" for a, b, r in zip(lon, lat, radius))
+        # 不裁剪，全部 1 万个障碍物参与规划
+        circles, _ = import_chart(str(path), origin=(0.0, 0.0), half_range=0, cache_dir=str(tmp_path))
+        assert len(circles) == 10000
+        return circles.tolist()
+
+    def test_plan_within_budget(self, chart):
+        prompts = []
+
+        class NullClient:
+            def complete(self, messages, temperature=0.1, cancel_event=None):
+                prompts.append(messages[-1]['content'])
+                return 'null'
+
+        skill = CollisionAvoidanceSkill(client=NullClient())
+        started = time.monotonic()
+        result = skill.plan([-90, -90], [90, 90], chart, "测试", safe_distance=5, max_retries=1)
+
+        assert time.monotonic() - started < 10
+        assert result['validation_status'] == 'SAFE' and result['planner'] == 'geometric'
+        assert skill._validate_path_with_segments(result['waypoints'], chart, 5)['is_valid']
+        # Prompt 只列出距航线最近的障碍物
+        assert prompts[0].count('【障碍物') == Config.LLM_PROMPT_OBSTACLES
+        assert len(prompts[0]) < 50000
+
+    def test_incremental_replan_within_budget(self, chart):
+        waypoints = CollisionAvoidanceSkill(client=object()).plan_geometric([-90, -90], [90, 90], chart, 5)['waypoints']
+        replanner = IncrementalReplanner(waypoints, chart, safe_distance=5, horizon=500)
+
+        # 船舶位于最长航段起点时，该航段中点出现新障碍物
+        k = int(np.argmax(replanner.path.segment_lengths()))
+        (x0, y0), (x1, y1) = replanner.path[k], replanner.path[k + 1]
+        replanner.target_index = k + 1
+        started = time.monotonic()
+        replanner.update_obstacles(chart + [[(x0 + x1) / 2, (y0 + y1) / 2, 2.0]])
+        event = replanner.check(x0, y0)
+
+        assert time.monotonic() - started < 10
+        assert event['status'] == 'REPLANNED'
+        assert replanner.planner.segments_clear(replanner.path.points[:-1], replanner.path.points[1:]).all()
+
+
+def test_circles_outline_batches_with_nan_gaps():
+    xs, ys = circles_outline([[0, 0, 1], [10, 0, 2]], offset=1.0)
+
+    assert xs.shape == ys.shape == (104,)
+    assert np.isnan(xs[51]) and np.isnan(xs[103])
+    assert np.nanmax(xs) == pytest.approx(13.0)
@@ -1,8 +1,21 @@
 import pytest
 import math
+import json
 from skills.collision_avoidance import CollisionAvoidanceSkill
 
 
+class FakeClient:
+    """按顺序返回预设回复的 LLM 客户端"""
+
+    def __init__(self, replies):
+        self.replies = list(replies)
+        self.calls = 0
+
+    def complete(self, messages, temperature=0.1, cancel_event=None):
+        self.calls += 1
+        return self.replies.pop(0)
+
+
 class TestCollisionAvoidanceSkill:
     """避碰规划技能测试"""
 
@@ -38,6 +51,31 @@ class TestCollisionAvoidanceSkill:
         result = skill._validate_path_with_segments(waypoints, obstacles, safe_distance=10)
         assert result['is_valid'] == False
 
+    def test_plan_retries_non_object_json(self):
+        """LLM 返回数组或 null 时视为空结果并重试"""
+        waypoints = [{'x': -50, 'y': -50}, {'x': -50, 'y': 50}, {'x': 50, 'y': 50}]
+        client = FakeClient(['[1, 2]', 'null', json.dumps({'waypoints': waypoints})])
+        skill = CollisionAvoidanceSkill(client=client)
+
+        result = skill.plan([-50, -50], [50, 50], [[0, 0, 15]], "测试", safe_distance=10)
+
+        assert client.calls == 3
+        assert result['validation_status'] == 'SAFE'
+        assert result['waypoints'] == waypoints
+
+    def test_plan_normalises_list_waypoints(self):
+        """[[x, y], ...] 形式的航点统一转换为 dict 列表，格式错误的航点重试"""
+        replies = [json.dumps({'waypoints': [[-50, -50], [-50]]}),
+                   json.dumps({'waypoints': [[-50, -50], [-50, 50], [50, 50]]})]
+        client = FakeClient(replies)
+        skill = CollisionAvoidanceSkill(client=client)
+
+        result = skill.plan([-50, -50], [50, 50], [[0, 0, 15]], "测试", safe_distance=10)
+
+        assert client.calls == 2
+        assert result['validation_status'] == 'SAFE'
+        assert result['waypoints'] == [{'x': -50.0, 'y': -50.0}, {'x': -50.0, 'y': 50.0}, {'x': 50.0, 'y': 50.0}]
+
 
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
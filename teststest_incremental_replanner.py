@@ -0,0 +1,97 @@
+import math
+import pytest
+from skills.collision_avoidance import CollisionAvoidanceSkill
+from skills.incremental_replanner import IncrementalReplanner
+
+
+class TestIncrementalReplanner:
+    """滚动时域增量重规划测试"""
+
+    def setup_method(self):
+        # 沿 x 轴的直线航路
+        self.waypoints = [{'x': -50, 'y': 0}, {'x': 0, 'y': 0}, {'x': 50, 'y': 0}]
+
+    def test_no_replan_when_path_clear(self):
+        replanner = IncrementalReplanner(self.waypoints, [[0, 40, 5]], safe_distance=10, horizon=30)
+        assert replanner.check(-50, 0) is None
+        assert replanner.events == []
+
+    def test_obstacle_beyond_horizon_is_ignored(self):
+        replanner = IncrementalReplanner(self.waypoints, [], safe_distance=10, horizon=20)
+        replanner.advance()
+        replanner.update_obstacles([[40, 0, 5]])  # 第二段航路上，但超出前视距离
+
+        assert replanner.check(-45, 0) is None
+
+    def test_replans_from_current_position(self):
+        replanner = IncrementalReplanner(self.waypoints, [], safe_distance=10, horizon=30)
+        replanner.advance()
+        replanner.update_obstacles([[-20, 0, 5]])  # 仿真途中新增障碍物，挡住当前航段
+
+        event = replanner.check(-45, 0)
+
+        assert event['status'] == 'REPLANNED'
+        assert event['latency_ms'] >= 0
+        assert event['added_waypoints'] > 0
+        # 已经过的航点和受阻航段之后的航点保持不变
+        assert replanner.waypoints[0] == self.waypoints[0]
+        assert replanner.waypoints[-2:] == [{'x': 0.0, 'y': 0.0}, {'x': 50.0, 'y': 0.0}]
+
+        remaining = [{'x': -45, 'y': 0}] + replanner.waypoints[replanner.target_index:]
+        result = CollisionAvoidanceSkill()._validate_path_with_segments(remaining, [[-20, 0, 5]], 10)
+        assert result['is_valid'] == True
+
+    def test_skips_blocked_waypoint(self):
+        replanner = IncrementalReplanner(self.waypoints, [], safe_distance=10, horizon=100)
+        replanner.advance()
+        replanner.update_obstacles([[0, 0, 5]])  # 障碍物正好落在中间航点上
+
+        event = replanner.check(-45, 0)
+
+        assert event['status'] == 'REPLANNED'
+        assert replanner.waypoints[event['rejoin_index']] == {'x': 50.0, 'y': 0.0}
+        assert {'x': 0.0, 'y': 0.0} not in replanner.waypoints
+
+    def test_failed_replan_is_retried_after_moving(self):
+        replanner = IncrementalReplanner(self.waypoints, [], safe_distance=10, horizon=100, retry_distance=2)
+        replanner.advance()
+        replanner.update_obstacles([[0, 0, 5], [50, 0, 5]])  # 剩余航点全部失效
+
+        assert replanner.check(-45, 0)['status'] == 'FAILED'
+        assert replanner.check(-44, 0) is None  # 移动不足 retry_distance，不重复尝试
+        assert replanner.check(-43, 0)['status'] == 'FAILED'
+        assert len(replanner.events) == 2
+
+    def test_escapes_hazard_inside_safety_zone(self):
+        replanner = IncrementalReplanner(self.waypoints[::2], [], safe_distance=10, horizon=30)
+        replanner.advance()
+        obstacles = [[-33, 0, 3]]  # 新障碍物出现在船舶自身安全区内（距中心 12m < 13m）
+        replanner.update_obstacles(obstacles)
+
+        x, y = -45.0, 0.0
+        event = replanner.check(x, y)
+        assert event['status'] == 'REPLANNED'
+
+        # 沿重规划后的航路行驶，后续帧不再重复重规划，且不会比出发时更靠近障碍物
+        track = [(x, y)]
+        while not replanner.finished:
+            assert replanner.check(x, y) is None
+            tx, ty = replanner.current_target()
+            step = min(1.0, math.hypot(tx - x, ty - y))
+            if step < 1e-9:
+                replanner.advance()
+                continue
+            heading = math.atan2(ty - y, tx - x)
+            x, y = x + step * math.cos(heading), y + step * math.sin(heading)
+            track.append((x, y))
+
+        assert len(replanner.events) == 1
+        assert min(math.hypot(px + 33, py) for px, py in track) >= 12 - 1e-6
+        assert replanner.waypoints[-1] == {'x': 50.0, 'y': 0.0}
+        # 驶出点之后的航路满足安全距离
+        result = CollisionAvoidanceSkill()._validate_path_with_segments(replanner.waypoints[1:], obstacles, 10)
+        assert result['is_valid'] == True
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,219 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from skills.collision_avoidance import CollisionAvoidanceSkill
+from utils.llm_client import (
+    CircuitBreaker, LLMCancelledError, LLMClient, LLMUnavailableError, TokenBucket
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """模拟 OpenAI 兼容接口：路径中含 /fail/ 返回 429，含 /auth/ 返回 401，否则返回固定航点"""
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.server.paths.append(self.path)
+        if '/fail/' in self.path:
+            status, body = 429, {"error": {"message": "rate limited", "type": "rate_limit"}}
+        elif '/auth/' in self.path:
+            status, body = 401, {"error": {"message": "invalid api key", "type": "invalid_request_error"}}
+        else:
+            content = json.dumps({"waypoints": [{"x": 0, "y": 0}, {"x": 1, "y": 1}], "explanation": "stub"})
+            status, body = 200, {
+                "id": "stub", "object": "chat.completion", "created": 0, "model": "stub",
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": content}}],
+                "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2}
+            }
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.paths = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def make_client(server, ok=True, **kwargs):
+    base = f"http://127.0.0.1:{server.server_port}/{'ok' if ok else 'fail'}/v1"
+    kwargs.setdefault('timeout', 2.0)
+    kwargs.setdefault('backoff_base', 0.0)
+    return LLMClient(model="openai/stub", api_key="test", api_base=base, **kwargs)
+
+
+class TestTokenBucket:
+    """令牌桶限流测试"""
+
+    def test_burst_then_refill(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=2, capacity=2, clock=clock)
+
+        assert bucket.try_acquire()[0]
+        assert bucket.try_acquire()[0]
+        ok, wait = bucket.try_acquire()
+        assert not ok and wait == pytest.approx(0.5)
+
+        clock.now += 0.5
+        assert bucket.try_acquire()[0]
+
+
+class TestCircuitBreaker:
+    """熔断器状态转换测试"""
+
+    def test_open_half_open_close(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=2, cooldown=10, clock=clock)
+
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.CLOSED
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+        assert not breaker.allow()
+
+        clock.now += 10
+        assert breaker.allow()  # 半开：放行一次试探
+        assert not breaker.allow()
+        breaker.record_success()
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    def test_failed_probe_reopens(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=1, cooldown=10, clock=clock)
+        breaker.record_failure()
+        clock.now += 10
+        assert breaker.allow()
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+
+    def test_neutral_probe_keeps_breaker_half_open(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=1, cooldown=10, clock=clock)
+        breaker.record_failure()
+        clock.now += 10
+        assert breaker.allow()
+        breaker.record_neutral()  # 如 401：不能说明链路已恢复
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        assert breaker.allow()  # 可以再次试探
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+
+
+class TestLLMClient:
+    """基于本地桩服务器的 LLM 客户端测试"""
+
+    def test_complete_success(self, stub_server):
+        client = make_client(stub_server)
+        content = client.complete([{"role": "user", "content": "hi"}])
+        assert json.loads(content)['explanation'] == "stub"
+
+    def test_retries_then_opens_breaker(self, stub_server):
+        client = make_client(stub_server, ok=False, max_attempts=3, breaker_threshold=2)
+
+        with pytest.raises(LLMUnavailableError):
+            client.complete([{"role": "user", "content": "hi"}])
+        # 连续失败 2 次后熔断，第 3 次不再发出请求
+        assert len(stub_server.paths) == 2
+
+        with pytest.raises(LLMUnavailableError):
+            client.complete([{"role": "user", "content": "hi"}])
+        assert len(stub_server.paths) == 2
+
+    def test_switches_to_fallback_model(self, stub_server):
+        ok_base = f"http://127.0.0.1:{stub_server.server_port}/ok/v1"
+        client = make_client(stub_server, ok=False, max_attempts=1, breaker_threshold=1,
+                             fallback_model="openai/backup", fallback_api_base=ok_base)
+
+        content = client.complete([{"role": "user", "content": "hi"}])
+        assert json.loads(content)['explanation'] == "stub"
+        assert [p.split('/')[1] for p in stub_server.paths] == ['fail', 'ok']
+
+    def test_plan_falls_back_to_geometric(self, stub_server):
+        client = make_client(stub_server, ok=False, max_attempts=1, breaker_threshold=1)
+        skill = CollisionAvoidanceSkill(client=client)
+
+        result = skill.plan([-50, -50], [50, 50], [[0, 0, 15], [20, 20, 10]],
+                            "测试", safe_distance=10, max_retries=5)
+
+        assert result['planner'] == 'geometric'
+        assert result['validation_status'] == 'SAFE'
+        assert len(stub_server.paths) == 1
+
+    def test_refused_probe_does_not_consume_token(self, stub_server):
+        bucket = TokenBucket(rate=0.001, capacity=1)
+        client = make_client(stub_server, rate_limiter=bucket, breaker_threshold=1, breaker_cooldown=0)
+        breaker = client.routes[0]['breaker']
+        breaker.record_failure()
+        assert breaker.allow()  # 其他请求正在半开试探
+
+        with pytest.raises(LLMUnavailableError):
+            client.complete([{"role": "user", "content": "hi"}])
+        assert stub_server.paths == []
+        assert bucket.try_acquire()[0]
+
+    def test_plan_does_not_resend_rejected_request(self, stub_server):
+        client = make_client(stub_server)
+        for route in client.routes:
+            route['api_base'] = route['api_base'].replace('/ok/', '/auth/')
+        skill = CollisionAvoidanceSkill(client=client)
+
+        result = skill.plan([-50, -50], [50, 50], [[0, 0, 15]], "测试", safe_distance=10, max_retries=5)
+
+        assert len(stub_server.paths) == 1
+        assert result['planner'] == 'geometric'
+        assert result['explanation'].startswith("LLM 请求错误")
+        assert client.routes[0]['breaker'].state == CircuitBreaker.CLOSED
+
+    def test_cancel_interrupts_backoff(self, stub_server):
+        client = make_client(stub_server, ok=False, max_attempts=3)
+        client._backoff = lambda attempt: 5.0
+        cancel = threading.Event()
+        threading.Timer(0.2, cancel.set).start()
+
+        started = time.monotonic()
+        with pytest.raises(LLMCancelledError):
+            client.complete([{"role": "user", "content": "hi"}], cancel_event=cancel)
+        assert time.monotonic() - started < 3
+        assert len(stub_server.paths) == 1
+
+    def test_plan_returns_cancelled(self, stub_server):
+        client = make_client(stub_server, ok=False, max_attempts=3)
+        client._backoff = lambda attempt: 5.0
+        skill = CollisionAvoidanceSkill(client=client)
+        cancel = threading.Event()
+        threading.Timer(0.2, cancel.set).start()
+
+        result = skill.plan([-50, -50], [50, 50], [[0, 0, 15]], "测试", safe_distance=10, cancel_event=cancel)
+
+        assert result['validation_status'] == 'CANCELLED'
+        assert result['waypoints'] == []
+        assert len(stub_server.paths) == 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,207 @@
+import json
+import math
+import time
+from collections import OrderedDict
+import pytest
+from skills import geometric_planner
+from skills.collision_avoidance import CollisionAvoidanceSkill
+from skills.geometric_planner import GeometricPlanner
+import numpy as np
+from skills.mission_planner import MissionPlanner, _nearest_neighbour, _route_cost, order_visits
+
+
+def line_costs(xs):
+    return [[abs(a - b) for b in xs] for a in xs]
+
+
+class FixedReplyClient:
+    """每次都返回同一组航点的 LLM 客户端"""
+
+    def __init__(self, points):
+        self.reply = json.dumps({'waypoints': [{'x': x, 'y': y} for x, y in points]})
+
+    def complete(self, messages, temperature=0.1, cancel_event=None):
+        return self.reply
+
+
+class TestOrderVisits:
+    """访问顺序启发式测试"""
+
+    def test_open_route_on_a_line(self):
+        xs = [0, 5, 1, 4, 2, 3]
+        route = order_visits(line_costs(xs), start=0)
+        assert [xs[i] for i in route] == [0, 1, 2, 3, 4, 5]
+
+    def test_fixed_end(self):
+        xs = [0, 3, 1, 2, 10]
+        route = order_visits(line_costs(xs), start=0, end=4)
+        assert route[0] == 0 and route[-1] == 4
+        assert [xs[i] for i in route] == [0, 1, 2, 3, 10]
+
+    def test_improves_on_nearest_neighbour(self):
+        pts = [(0, 0), (10, 0), (10, 10), (0, 10), (5, 5), (12, 4), (-3, 7)]
+        costs = np.array([[math.dist(a, b) for b in pts] for a in pts])
+        route = order_visits(costs, start=0)
+
+        assert sorted(route) == list(range(len(pts)))
+        greedy = _nearest_neighbour(np.pad(costs, ((0, 1), (0, 1))), 0, len(pts))[:-1]
+        assert _route_cost(costs, np.array(route)) <= _route_cost(costs, greedy) + 1e-9
+
+
+class TestMissionPlanner:
+    """多目标任务规划测试"""
+
+    def setup_method(self):
+        self.obstacles = [[0, 0, 15], [40, 40, 10]]
+        self.tasks = [[50, 0], [60, -40], [-50, 40], [0, 60], [-60, -20]]
+
+    def test_mission_visits_all_tasks_safely(self):
+        planner = MissionPlanner(self.obstacles, safe_distance=10)
+        result = planner.plan([-50, -50], self.tasks, return_to_start=True)
+
+        assert sorted(result['order']) == list(range(len(self.tasks)))
+        assert result['validation_status'] == 'SAFE'
+        assert result['waypoints'][0] == result['waypoints'][-1] == {'x': -50.0, 'y': -50.0}
+        for task in self.tasks:
+            assert {'x': float(task[0]), 'y': float(task[1])} in result['waypoints']
+
+        validation = CollisionAvoidanceSkill()._validate_path_with_segments(
+            result['waypoints'], self.obstacles, 10)
+        assert validation['is_valid'] == True
+        assert result['total_length'] == pytest.approx(sum(leg['length'] for leg in result['legs']))
+
+    def test_reuses_cached_legs(self, monkeypatch):
+        planner = MissionPlanner(self.obstacles, safe_distance=10)
+        planner.plan([-50, -50], self.tasks)
+
+        computed = []
+        original = planner.geometry.path_costs
+
+        def counting(sources, *args, **kwargs):
+            computed.extend(sources)
+            return original(sources, *args, **kwargs)
+
+        monkeypatch.setattr(planner.geometry, 'path_costs', counting)
+        self.tasks[2] = [-60, 60]
+        planner.plan([-50, -50], self.tasks)
+
+        assert computed == [(-60.0, 60.0)]
+
+    def test_unreachable_task_is_reported_not_stitched(self):
+        planner = MissionPlanner(self.obstacles, safe_distance=10)
+        tasks = self.tasks + [[5, 5]]  # 位于障碍物安全区内
+        result = planner.plan([-50, -50], tasks)
+
+        assert result['unreachable'] == [len(tasks) - 1]
+        assert sorted(result['order']) == list(range(len(self.tasks)))
+        assert result['validation_status'] == 'SAFE'
+        assert math.isfinite(result['total_length'])
+        validation = CollisionAvoidanceSkill()._validate_path_with_segments(
+            result['waypoints'], self.obstacles, 10)
+        assert validation['is_valid'] == True
+
+    def test_stops_at_failed_leg(self, monkeypatch):
+        skill = CollisionAvoidanceSkill()
+        planner = MissionPlanner(self.obstacles, safe_distance=10, skill=skill)
+        original = skill.plan_geometric
+        blocked = (0.0, 60.0)
+
+        def failing(start, end, *args):
+            if tuple(end) == blocked or tuple(start) == blocked:
+                return {'waypoints': [], 'validation_status': 'FAILED'}
+            return original(start, end, *args)
+
+        monkeypatch.setattr(skill, 'plan_geometric', failing)
+        result = planner.plan([-50, -50], self.tasks)
+
+        assert result['validation_status'] == 'FAILED'
+        assert 3 not in result['order'] and 3 in result['unreachable']
+        assert len(result['legs']) == len(result['order'])
+        assert {'x': 0.0, 'y': 60.0} not in result['waypoints']
+        assert math.isfinite(result['total_length'])
+        validation = CollisionAvoidanceSkill()._validate_path_with_segments(
+            result['waypoints'], self.obstacles, 10)
+        assert validation['is_valid'] == True
+
+    def test_llm_leg_endpoints_are_pinned(self):
+        # LLM 航段没有从起点出发：补上起点后该航段穿过障碍物，不能报告为 SAFE
+        skill = CollisionAvoidanceSkill(client=FixedReplyClient([(60, 60), (50, 50)]))
+        planner = MissionPlanner([[0, 0, 15]], safe_distance=10, skill=skill)
+        result = planner.plan([-50, -50], [[50, 50]], use_llm=True)
+
+        assert result['order'] == [0]
+        assert result['waypoints'] == [{'x': -50.0, 'y': -50.0}, {'x': 60.0, 'y': 60.0}, {'x': 50.0, 'y': 50.0}]
+        assert result['validation_status'] == 'RISKY'
+        validation = skill._validate_path_with_segments(result['waypoints'], [[0, 0, 15]], 10)
+        assert validation['is_valid'] == False
+
+    def test_llm_leg_pinned_and_safe(self):
+        skill = CollisionAvoidanceSkill(client=FixedReplyClient([(-60, 60), (50, 50)]))
+        planner = MissionPlanner([[0, 0, 15]], safe_distance=10, skill=skill)
+        result = planner.plan([-50, -50], [[50, 50]], use_llm=True)
+
+        assert result['waypoints'] == [{'x': -50.0, 'y': -50.0}, {'x': -60.0, 'y': 60.0}, {'x': 50.0, 'y': 50.0}]
+        assert result['validation_status'] == 'SAFE'
+        assert skill._validate_path_with_segments(result['waypoints'], [[0, 0, 15]], 10)['is_valid']
+
+
+class TestManyObstacles:
+    """障碍物超过 40 个时的多目标任务规划"""
+
+    def setup_method(self):
+        rng = np.random.default_rng(0)
+        xs, ys = np.meshgrid(np.arange(-250, 251, 50), np.arange(-250, 251, 50))
+        self.obstacles = np.column_stack([xs.ravel() + rng.uniform(-10, 10, xs.size),
+                                          ys.ravel() + rng.uniform(-10, 10, xs.size),
+                                          rng.uniform(5, 10, xs.size)]).round(1).tolist()
+        candidates = rng.uniform(-260, 260, (400, 2)).round(1)
+        self.tasks = candidates[GeometricPlanner(self.obstacles, 10).points_clear(candidates)][:100].tolist()
+        self.start = [-275, -275]
+
+    def test_hundred_tasks_within_budget(self):
+        assert len(self.obstacles) > 40 and len(self.tasks) == 100
+        started = time.monotonic()
+        result = MissionPlanner(self.obstacles, safe_distance=10).plan(self.start, self.tasks)
+
+        assert time.monotonic() - started < 10
+        assert result['unreachable'] == []
+        assert sorted(result['order']) == list(range(len(self.tasks)))
+        assert result['validation_status'] == 'SAFE'
+        validation = CollisionAvoidanceSkill()._validate_path_with_segments(
+            result['waypoints'], self.obstacles, 10)
+        assert validation['is_valid'] == True
+
+    def test_local_costs_match_full_graph(self, monkeypatch):
+        points = np.array([self.start] + self.tasks[:10])
+        full = GeometricPlanner(self.obstacles, 10).path_costs(points, points)
+        monkeypatch.setattr(GeometricPlanner, 'MAX_GRAPH_OBSTACLES', 60)
+        local = GeometricPlanner(self.obstacles, 10)
+
+        assert local.local
+        np.testing.assert_allclose(local.path_costs(points, points), full)
+
+    def test_gave_up_is_not_unreachable(self, monkeypatch):
+        # 障碍物子集上限很小时几何规划器放弃计算：代价记为 nan，任务点仍参与排序，不报告为不可达
+        monkeypatch.setattr(GeometricPlanner, 'MAX_GRAPH_OBSTACLES', 20)
+        monkeypatch.setattr(geometric_planner, '_planner_cache', OrderedDict())
+        planner = MissionPlanner(self.obstacles, safe_distance=10)
+        tasks = self.tasks[:15]
+        costs = planner.leg_cost_matrix([self.start] + tasks)
+
+        assert np.isnan(costs).any() and not np.isinf(costs).any()
+        result = planner.plan(self.start, tasks)
+        assert result['unreachable'] == []
+        assert sorted(result['order']) == list(range(len(tasks)))
+        assert result['validation_status'] == 'SAFE'
+
+        # 单个航段放弃规划时给出与“不存在通路”不同的说明
+        monkeypatch.setattr(GeometricPlanner, 'MAX_GRAPH_OBSTACLES', 2)
+        monkeypatch.setattr(geometric_planner, '_planner_cache', OrderedDict())
+        points, length = GeometricPlanner(self.obstacles, 10).shortest_path(self.start, [275, 275])
+        assert points is None and math.isnan(length)
+        leg = CollisionAvoidanceSkill().plan_geometric(self.start, [275, 275], self.obstacles, 10)
+        assert leg['validation_status'] == 'FAILED' and '放弃' in leg['explanation']
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
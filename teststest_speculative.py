@@ -0,0 +1,99 @@
+import gc
+import threading
+import time
+
+import pytest
+from utils.speculative import SpeculativeRunner
+
+
+class TestSpeculativeRunner:
+    """预测式后台任务测试"""
+
+    def test_newer_edit_cancels_stale_job(self):
+        runner = SpeculativeRunner(debounce=0.2)
+        calls = []
+
+        runner.submit('a', lambda cancel: calls.append('a') or 'A')
+        runner.submit('b', lambda cancel: calls.append('b') or 'B')
+
+        assert runner.take('a') is None
+        assert runner.take('b', timeout=5) == 'B'
+        assert calls == ['b']
+
+    def test_same_key_is_not_resubmitted(self):
+        runner = SpeculativeRunner(debounce=0)
+        assert runner.submit('a', lambda cancel: 'A')
+        assert not runner.submit('a', lambda cancel: 'A2')
+        assert runner.take('a', timeout=5) == 'A'
+        # 刚被取走的输入不会立即重复执行
+        assert not runner.submit('a', lambda cancel: 'A3')
+        assert runner.status('a') == SpeculativeRunner.IDLE
+
+    def test_take_waits_for_in_flight_job(self):
+        runner = SpeculativeRunner(debounce=0)
+        started = threading.Event()
+
+        def slow(cancel):
+            started.set()
+            time.sleep(0.2)
+            return 'done'
+
+        runner.submit('a', slow)
+        assert started.wait(5)
+        assert runner.status('a') == SpeculativeRunner.RUNNING
+        assert runner.take('a', timeout=5) == 'done'
+
+    def test_take_skips_debounce(self):
+        runner = SpeculativeRunner(debounce=30)
+        runner.submit('a', lambda cancel: 'A')
+        assert runner.status('a') == SpeculativeRunner.PENDING
+
+        started = time.monotonic()
+        assert runner.take('a', timeout=5) == 'A'
+        assert time.monotonic() - started < 5
+
+    def test_cancel_event_reaches_running_job(self):
+        runner = SpeculativeRunner(debounce=0)
+        started, seen = threading.Event(), threading.Event()
+
+        def job(cancel):
+            started.set()
+            if cancel.wait(5):
+                seen.set()
+
+        runner.submit('a', job)
+        assert started.wait(5)
+        runner.submit('b', lambda cancel: 'B')
+
+        assert seen.wait(5)
+        assert runner.take('b', timeout=5) == 'B'
+
+    def test_take_does_not_wait_behind_stale_job(self):
+        runner = SpeculativeRunner(debounce=0)
+        started, release = threading.Event(), threading.Event()
+
+        def stale(cancel):
+            # 模拟无法中断的进行中请求
+            started.set()
+            release.wait(5)
+
+        runner.submit('a', stale)
+        assert started.wait(5)
+        runner.submit('b', lambda cancel: 'B')
+
+        begin = time.monotonic()
+        assert runner.take('b', timeout=5) == 'B'
+        assert time.monotonic() - begin < 1
+        release.set()
+
+    def test_executor_shut_down_when_collected(self):
+        runner = SpeculativeRunner(debounce=0)
+        assert runner.take('a') is None
+        executor = runner._executor
+        del runner
+        gc.collect()
+        assert executor._shutdown
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
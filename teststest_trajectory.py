@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+from simulator.vessel_mock import VesselMock
+from utils.trajectory import Path, Trajectory, circle_outline
+
+
+class TestPath:
+    """数组化航点序列测试"""
+
+    def test_dict_round_trip(self):
+        waypoints = [{'x': -50, 'y': -50}, {'x': 0.5, 'y': 10}, {'x': 50, 'y': 50}]
+        path = Path.from_dicts(waypoints)
+
+        assert len(path) == 3
+        assert path.to_dicts() == [{'x': -50.0, 'y': -50.0}, {'x': 0.5, 'y': 10.0}, {'x': 50.0, 'y': 50.0}]
+        assert path[1] == (0.5, 10.0)
+        assert list(path) == [(-50.0, -50.0), (0.5, 10.0), (50.0, 50.0)]
+
+    def test_views_are_zero_copy(self):
+        path = Path.from_points([(0, 0), (3, 4), (6, 8)])
+
+        assert path.x.dtype == np.float64 and path.x.flags['C_CONTIGUOUS']
+        assert np.shares_memory(path.x, path.points)
+        starts, ends = path.segments()
+        assert np.shares_memory(starts, path.points) and np.shares_memory(ends, path.points)
+        assert path.length() == pytest.approx(10.0)
+
+    def test_splice(self):
+        path = Path.from_points([(0, 0), (1, 0), (2, 0), (3, 0)])
+        spliced = path.splice(1, 3, [(1, 5), (2, 5), (2.5, 5)])
+
+        assert list(spliced) == [(0.0, 0.0), (1.0, 5.0), (2.0, 5.0), (2.5, 5.0), (3.0, 0.0)]
+        assert len(path) == 4  # 原路径不变
+
+
+class TestTrajectory:
+    """航迹环形缓冲区测试"""
+
+    def test_ring_buffer_keeps_latest_points(self):
+        history = Trajectory(capacity=3)
+        for i in range(5):
+            history.append(i, -i)
+
+        assert len(history) == 3
+        assert list(history) == [(2.0, -2.0), (3.0, -3.0), (4.0, -4.0)]
+        assert history[0] == (2.0, -2.0) and history[-1] == (4.0, -4.0)
+        assert history.x.tolist() == [2.0, 3.0, 4.0]
+
+    def test_decimation(self):
+        history = Trajectory(capacity=100, decimation=3)
+        for i in range(10):
+            history.append(i, 0)
+        history.append(99, 0, force=True)
+
+        assert history.x.tolist() == [0.0, 3.0, 6.0, 9.0, 99.0]
+
+    def test_vessel_history_is_bounded(self):
+        vessel = VesselMock(x=0, y=0, history_capacity=10)
+        for _ in range(100):
+            vessel.update_position(1000, 0, speed=1.0)
+
+        assert len(vessel.path_history) == 10
+        assert vessel.path_history[-1] == (vessel.x, vessel.y)
+
+        vessel.reset(5, 5)
+        assert list(vessel.path_history) == [(5.0, 5.0)]
+
+
+def test_circle_outline():
+    xs, ys = circle_outline(10, -10, 5)
+    assert len(xs) == 51
+    assert np.allclose(np.hypot(xs - 10, ys + 10), 5)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,324 @@
+import codecs
+import csv
+import hashlib
+import json
+import math
+import os
+import re
+
+import numpy as np
+
+from config import Config
+
+EARTH_RADIUS = 6371008.8  # 地球平均半径 (m)
+CACHE_VERSION = 1  # 解析/投影逻辑变化时递增，使旧缓存失效
+
+_X_NAMES = ('x', 'east', 'easting')
+_Y_NAMES = ('y', 'north', 'northing')
+_LON_NAMES = ('lon', 'lng', 'long', 'longitude')
+_LAT_NAMES = ('lat', 'latitude')
+_RADIUS_NAMES = ('radius', 'r', 'radius_m')
+
+
+class ChartImportError(ValueError):
+    """海图文件格式无法识别"""
+
+
+def project(lon, lat, origin_lon, origin_lat):
+    """
+    经纬度 → 以 (origin_lon, origin_lat) 为原点的局部平面坐标 (m)，x 向东、y 向北。
+    采用等距圆柱投影，在 Config.MAP_RANGE 量级的作业区内误差可忽略。
+    """
+    lon = np.asarray(lon, dtype=np.float64)
+    lat = np.asarray(lat, dtype=np.float64)
+    x = np.radians(lon - origin_lon) * EARTH_RADIUS * math.cos(math.radians(origin_lat))
+    y = np.radians(lat - origin_lat) * EARTH_RADIUS
+    return x, y
+
+
+def clip_to_area(circles, half_range):
+    """保留与作业区 [-half_range, half_range]² 相交的圆形障碍物"""
+    reach = half_range + circles[:, 2]
+    keep = (np.abs(circles[:, 0]) <= reach) & (np.abs(circles[:, 1]) <= reach)
+    return circles[keep]
+
+
+def file_digest(source, chunk_size=1 << 20):
+    """分块计算文件 SHA-256（source 为路径或二进制文件对象）"""
+    digest = hashlib.sha256()
+    with _open_binary(source) as fh:
+        for block in iter(lambda: fh.read(chunk_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class _open_binary:
+    """打开路径或复用已打开的二进制文件对象（复用时回到开头且不关闭）"""
+
+    def __init__(self, source):
+        self.source = source
+        self.owned = isinstance(source, (str, os.PathLike))
+
+    def __enter__(self):
+        self.fh = open(self.source, 'rb') if self.owned else self.source
+        self.fh.seek(0)
+        return self.fh
+
+    def __exit__(self, *exc):
+        if self.owned:
+            self.fh.close()
+
+
+def _find_column(header, names):
+    for i, name in enumerate(header):
+        if name in names:
+            return i
+    return None
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except ValueError:
+        return math.nan
+
+
+def _csv_block(rows, cols):
+    """把一块 CSV 行转换为 (N, 3) 数组，无法解析坐标的行丢弃，缺失半径置为 nan"""
+    rows = [row for row in rows if any(cell.strip() for cell in row)]
+    block = np.full((len(rows), 3), np.nan)
+    for j, col in enumerate(cols):
+        if col is None:
+            continue
+        values = [row[col] if len(row) > col and row[col].strip() else 'nan' for row in rows]
+        try:
+            block[:, j] = np.asarray(values, dtype=np.float64)
+        except ValueError:
+            # 本块存在非数字内容时才退回逐个转换
+            block[:, j] = [_to_float(v) for v in values]
+    valid = ~np.isnan(block[:, :2]).any(axis=1)
+    return block[valid], len(rows) - int(valid.sum())
+
+
+def _iter_csv_chunks(fh, chunk_rows):
+    """
+    流式读取 CSV，逐块产出 (数组 [a, b, radius], 是否经纬度, 跳过行数)。
+    支持表头 x/y[/radius] 或 lon/lat[/radius]；无表头时按 "x, y[, 半径]" 解析（与文本框格式一致）。
+    """
+    reader = csv.reader(codecs.getreader('utf-8-sig')(fh))
+    first = next(reader, None)
+    if first is None:
+        return
+
+    header = [cell.strip().lower() for cell in first]
+    lon_col, lat_col = _find_column(header, _LON_NAMES), _find_column(header, _LAT_NAMES)
+    x_col, y_col = _find_column(header, _X_NAMES), _find_column(header, _Y_NAMES)
+    if lon_col is not None and lat_col is not None:
+        cols, geographic, rows = (lon_col, lat_col, _find_column(header, _RADIUS_NAMES)), True, []
+    elif x_col is not None and y_col is not None:
+        cols, geographic, rows = (x_col, y_col, _find_column(header, _RADIUS_NAMES)), False, []
+    elif len(first) >= 2 and all(not math.isnan(_to_float(cell)) for cell in first[:2]):
+        cols, geographic, rows = (0, 1, 2), False, [first]
+    else:
+        raise ChartImportError(f"无法识别 CSV 表头：{first}")
+
+    for row in reader:
+        rows.append(row)
+        if len(rows) >= chunk_rows:
+            block, skipped = _csv_block(rows, cols)
+            yield block, geographic, skipped
+            rows = []
+    if rows:
+        block, skipped = _csv_block(rows, cols)
+        yield block, geographic, skipped
+
+
+_FEATURES_ARRAY = re.compile(r'"features"\s*:\s*\[')
+
+
+def _iter_geojson_features(fh, read_size=1 << 20):
+    """
+    增量解析 GeoJSON，逐个产出 Feature，无需把整个文件载入内存。
+    支持 FeatureCollection，以及每行一个 Feature 的 GeoJSON 序列。
+    """
+    decoder = json.JSONDecoder()
+    text = codecs.getincrementaldecoder('utf-8-sig')()
+    buffer, pos, eof, in_array = '', 0, False, False
+
+    while True:
+        while pos < len(buffer) and buffer[pos] in ' \t\r\n,\x1e':
+            pos += 1
+        if in_array and pos < len(buffer) and buffer[pos] == ']':
+            return
+
+        obj = None
+        if pos < len(buffer):
+            try:
+                obj, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # 不完整：可能是尚未读完的大型 FeatureCollection，先定位到 features 数组内部
+                match = None if in_array else _FEATURES_ARRAY.search(buffer, pos)
+                if match:
+                    pos, in_array = match.end(), True
+                    continue
+
+        if obj is None:
+            if eof:
+                if pos < len(buffer):
+                    raise ChartImportError("GeoJSON 格式错误或文件不完整")
+                return
+            block = fh.read(read_size)
+            eof = not block
+            buffer = buffer[pos:] + text.decode(block, final=eof)
+            pos = 0
+            continue
+
+        pos = end
+        if not isinstance(obj, dict):
+            raise ChartImportError("GeoJSON 格式错误：期望 Feature 或 FeatureCollection 对象")
+        if obj.get('type') == 'FeatureCollection':
+            yield from obj.get('features', [])
+        else:
+            yield obj
+
+
+def _geometry_vertices(geometry):
+    """展开任意 GeoJSON 几何的顶点坐标 [(a, b), ...]"""
+    if geometry.get('type') == 'GeometryCollection':
+        return [v for g in geometry.get('geometries', []) for v in _geometry_vertices(g)]
+
+    def flatten(coords):
+        if not isinstance(coords, list):
+            raise ValueError(f"非法坐标：{coords!r}")
+        if coords and not isinstance(coords[0], list):
+            return [(coords[0], coords[1])]
+        return [v for item in coords for v in flatten(item)]
+
+    return flatten(geometry.get('coordinates') or [])
+
+
+def _feature_circle(feature, origin, default_radius, geographic):
+    """
+    单个 Feature → 局部坐标下的圆 (x, y, radius)：
+    点要素取 properties 中的半径；线/面要素取投影后顶点的外接圆（再加上半径属性作为余量）。
+    几何缺失或坐标不合法时返回 None（计入跳过数）
+    """
+    try:
+        vertices = _geometry_vertices(feature.get('geometry') or {})
+        if not vertices:
+            return None
+
+        props = feature.get('properties') or {}
+        radius = next((float(props[k]) for k in _RADIUS_NAMES if isinstance(props.get(k), (int, float))), None)
+
+        vertices = np.asarray(vertices, dtype=np.float64)
+    except (AttributeError, IndexError, KeyError, RecursionError, TypeError, ValueError):
+        return None
+
+    vx, vy = project(vertices[:, 0], vertices[:, 1], *origin) if geographic else vertices.T
+    if len(vertices) == 1:
+        return float(vx[0]), float(vy[0]), radius if radius is not None else default_radius
+
+    cx, cy = (vx.min() + vx.max()) / 2, (vy.min() + vy.max()) / 2
+    return float(cx), float(cy), float(np.hypot(vx - cx, vy - cy).max()) + (radius or 0.0)
+
+
+def _iter_geojson_chunks(fh, chunk_rows, origin, default_radius, geographic):
+    """逐块产出 (数组 [x, y, radius], 跳过要素数)"""
+    rows, skipped = [], 0
+    for feature in _iter_geojson_features(fh):
+        circle = _feature_circle(feature, origin, default_radius, geographic)
+        if circle is None:
+            skipped += 1
+            continue
+        rows.append(circle)
+        if len(rows) >= chunk_rows:
+            yield np.array(rows, dtype=np.float64), skipped
+            rows, skipped = [], 0
+    if rows or skipped:
+        yield np.array(rows, dtype=np.float64).reshape(-1, 3), skipped
+
+
+def _detect_format(name, head):
+    suffix = os.path.splitext(name or '')[1].lower()
+    if suffix in ('.geojson', '.json', '.geojsonl', '.geojsons'):
+        return 'geojson'
+    if suffix in ('.csv', '.txt'):
+        return 'csv'
+    return 'geojson' if head.lstrip(b'\xef\xbb\xbf \t\r\n\x1e').startswith(b'{') else 'csv'
+
+
+def import_chart(source, origin=None, half_range=None, default_radius=5.0, fmt=None,
+                 cache_dir=None, chunk_rows=None, geographic=None):
+    """
+    流式导入海图障碍物（CSV / GeoJSON），投影到局部平面坐标并裁剪到作业区，
+    结果按文件哈希缓存为 .npy（内存映射加载），相同文件再次导入时直接读取缓存。
+
+    :param source: 文件路径或二进制文件对象（如 Streamlit 的 UploadedFile）
+    :param origin: 局部坐标原点 (lon, lat)，默认 (Config.MAP_ORIGIN_LON, Config.MAP_ORIGIN_LAT)
+    :param half_range: 作业区半宽 (m)，默认 Config.MAP_RANGE / 2；None 以外的 0 或负数表示不裁剪
+    :param default_radius: 点要素未给出半径时使用的半径 (m)
+    :param fmt: 'csv' 或 'geojson'，默认按文件名/内容判断
+    :param geographic: GeoJSON 坐标是否为经纬度，默认 True（CSV 按表头判断）
+    :return: (障碍物数组 shape=(N, 3) [x, y, radius], 统计信息 dict)
+    """
+    origin = tuple(origin) if origin is not None else (Config.MAP_ORIGIN_LON, Config.MAP_ORIGIN_LAT)
+    half_range = Config.MAP_RANGE / 2 if half_range is None else half_range
+    cache_dir = cache_dir or Config.CHART_CACHE_DIR
+    chunk_rows = chunk_rows or Config.CHART_CHUNK_ROWS
+    geographic = True if geographic is None else geographic
+
+    with _open_binary(source) as fh:
+        head = fh.read(64)
+    name = source if isinstance(source, (str, os.PathLike)) else getattr(source, 'name', '')
+    fmt = fmt or _detect_format(str(name), head)
+
+    params = json.dumps([CACHE_VERSION, fmt, origin, half_range, default_radius, geographic])
+    cache_key = f"{file_digest(source)}_{hashlib.sha256(params.encode()).hexdigest()[:12]}"
+    cache_path = os.path.join(cache_dir, f"{cache_key}.npy")
+    if os.path.exists(cache_path):
+        try:
+            circles = np.load(cache_path, mmap_mode='r')
+        except (OSError, ValueError) as e:
+            print(f"⚠️ 海图缓存损坏，重新解析：{e}")
+        else:
+            return circles, {'total': len(circles), 'kept': len(circles), 'skipped': 0,
+                             'cached': True, 'cache_path': cache_path}
+
+    blocks, total, skipped = [], 0, 0
+    with _open_binary(source) as fh:
+        if fmt == 'csv':
+            chunks = _iter_csv_chunks(fh, chunk_rows)
+        else:
+            chunks = ((block, False, bad) for block, bad in
+                      _iter_geojson_chunks(fh, chunk_rows, origin, default_radius, geographic))
+
+        try:
+            for block, needs_projection, bad in chunks:
+                if needs_projection:
+                    block[:, 0], block[:, 1] = project(block[:, 0], block[:, 1], *origin)
+                block[np.isnan(block[:, 2]), 2] = default_radius
+                # 坐标非有限值（如 inf）或半径为负的记录同样视为无效
+                valid = np.isfinite(block).all(axis=1) & (block[:, 2] >= 0)
+                block = block[valid]
+                skipped += bad + len(valid) - len(block)
+                total += len(block)
+                blocks.append(clip_to_area(block, half_range) if half_range > 0 else block)
+        except (csv.Error, UnicodeDecodeError) as e:
+            raise ChartImportError(f"海图文件无法解析：{e}") from e
+
+    circles = np.ascontiguousarray(np.concatenate(blocks) if blocks else np.empty((0, 3)), dtype=np.float64)
+
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = cache_path + '.tmp.npy'
+        np.save(tmp_path, circles)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        # 缓存目录不可写时只影响下次导入的速度
+        print(f"⚠️ 海图缓存写入失败：{e}")
+        cache_path = None
+
+    print(f"🗺️ 海图导入：共 {total} 个障碍物，作业区内 {len(circles)} 个，跳过 {skipped} 条无效记录")
+    return circles, {'total': total, 'kept': len(circles), 'skipped': skipped,
+                     'cached': False, 'cache_path': cache_path}
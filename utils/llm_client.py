@@ -0,0 +1,292 @@
+import random
+import threading
+import time
+
+import httpx
+import litellm
+from litellm import completion
+from litellm import exceptions as llm_exceptions
+
+from config import Config
+
+
+class LLMError(Exception):
+    """LLM 调用失败的基类"""
+
+
+class LLMRequestError(LLMError):
+    """不可重试的请求错误（如鉴权失败、参数错误）"""
+
+
+class LLMUnavailableError(LLMError):
+    """LLM 服务暂不可用（熔断、限流排队超时或重试耗尽），调用方应走降级路径"""
+
+
+class LLMCancelledError(LLMError):
+    """调用方通过 cancel_event 取消了本次调用"""
+
+
+# 视为瞬时故障、值得退避重试的 HTTP 状态码
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+RETRYABLE_EXCEPTIONS = (
+    llm_exceptions.RateLimitError,
+    llm_exceptions.Timeout,
+    llm_exceptions.APIConnectionError,
+    llm_exceptions.ServiceUnavailableError,
+    llm_exceptions.InternalServerError,
+)
+
+
+class TokenBucket:
+    """
+    线程安全的令牌桶限流器。
+    以 rate 个/秒的速度补充令牌，最多累积 capacity 个（允许短时突发）。
+    """
+
+    def __init__(self, rate, capacity, clock=time.monotonic):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._clock = clock
+        self._tokens = float(capacity)
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self):
+        """立即尝试获取一个令牌，返回 (是否成功, 需等待的秒数)"""
+        with self._lock:
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True, 0.0
+            return False, (1 - self._tokens) / self.rate
+
+    def acquire(self, timeout=None):
+        """
+        阻塞获取一个令牌
+
+        :param timeout: 最长等待秒数，None 表示一直等待
+        :return: 是否在超时前获取成功
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            ok, wait = self.try_acquire()
+            if ok:
+                return True
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            time.sleep(wait)
+
+
+class CircuitBreaker:
+    """
+    熔断器：连续失败 failure_threshold 次后断开 (OPEN)，
+    冷却 cooldown 秒后进入半开 (HALF_OPEN) 放行一次试探请求，成功则恢复 (CLOSED)。
+    """
+
+    CLOSED = 'CLOSED'
+    OPEN = 'OPEN'
+    HALF_OPEN = 'HALF_OPEN'
+
+    def __init__(self, failure_threshold=5, cooldown=30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._clock = clock
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self._opened_at is None:
+            return self.CLOSED
+        if self._clock() - self._opened_at >= self.cooldown:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow(self):
+        """判断当前是否允许发出请求（半开状态只放行一个试探请求）"""
+        with self._lock:
+            state = self._state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_neutral(self):
+        """请求结束但不能说明链路健康与否（如 4xx 参数/鉴权错误）：只结束试探，不改变计数"""
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                self._opened_at = self._clock()
+            self._probing = False
+
+
+class LLMClient:
+    """
+    LLM 调用客户端：连接复用、令牌桶限流、单次调用超时、带抖动的指数退避重试，
+    以及主模型熔断后切换到备用模型。所有模型均不可用时抛出 LLMUnavailableError。
+    """
+
+    def __init__(self, model, api_key="", api_base=None,
+                 fallback_model=None, fallback_api_key=None, fallback_api_base=None,
+                 timeout=30.0, max_attempts=3, backoff_base=0.5, backoff_max=8.0,
+                 rate_limiter=None, breaker_threshold=5, breaker_cooldown=30.0):
+        self.routes = [
+            {'model': model, 'api_key': api_key, 'api_base': api_base or None,
+             'breaker': CircuitBreaker(breaker_threshold, breaker_cooldown)},
+        ]
+        if fallback_model:
+            self.routes.append({
+                'model': fallback_model,
+                'api_key': fallback_api_key if fallback_api_key is not None else api_key,
+                'api_base': (fallback_api_base if fallback_api_base is not None else api_base) or None,
+                'breaker': CircuitBreaker(breaker_threshold, breaker_cooldown),
+            })
+
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.rate_limiter = rate_limiter
+
+    @classmethod
+    def from_config(cls, rate_limiter=None):
+        """根据 Config 创建客户端"""
+        return cls(
+            model=Config.LLM_MODEL,
+            api_key=Config.LLM_API_KEY,
+            api_base=Config.LLM_BASE_URL,
+            fallback_model=Config.LLM_FALLBACK_MODEL,
+            fallback_api_key=Config.LLM_FALLBACK_API_KEY,
+            fallback_api_base=Config.LLM_FALLBACK_BASE_URL,
+            timeout=Config.LLM_TIMEOUT,
+            max_attempts=Config.LLM_MAX_ATTEMPTS,
+            backoff_base=Config.LLM_BACKOFF_BASE,
+            backoff_max=Config.LLM_BACKOFF_MAX,
+            rate_limiter=rate_limiter,
+            breaker_threshold=Config.LLM_BREAKER_THRESHOLD,
+            breaker_cooldown=Config.LLM_BREAKER_COOLDOWN,
+        )
+
+    def _backoff(self, attempt):
+        """全抖动 (full jitter) 指数退避时间"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    @staticmethod
+    def _is_retryable(exc):
+        if isinstance(exc, RETRYABLE_EXCEPTIONS):
+            return True
+        return getattr(exc, 'status_code', None) in RETRYABLE_STATUS
+
+    def complete(self, messages, temperature=0.1, deadline=None, cancel_event=None):
+        """
+        发送对话请求并返回文本内容
+
+        :param deadline: 本次调用（含重试）的总时长上限 (s)，默认 max_attempts × timeout
+        :param cancel_event: 可选的 threading.Event，在每次请求前和退避等待期间检查
+                             （已发出的单次请求无法中断，最长等待 timeout 秒）
+        :raises LLMRequestError: 不可重试的请求错误
+        :raises LLMUnavailableError: 所有模型均不可用
+        :raises LLMCancelledError: cancel_event 已置位
+        """
+        if deadline is None:
+            deadline = self.timeout * self.max_attempts
+        expires = time.monotonic() + deadline
+        last_error = "LLM 熔断中"
+
+        for route in self.routes:
+            breaker = route['breaker']
+            for attempt in range(self.max_attempts):
+                if cancel_event is not None and cancel_event.is_set():
+                    raise LLMCancelledError("LLM 调用已取消")
+                if breaker.state == CircuitBreaker.OPEN:
+                    break
+                remaining = expires - time.monotonic()
+                if remaining <= 0:
+                    raise LLMUnavailableError(f"LLM 调用超出时限 {deadline}s：{last_error}")
+                # 先确认熔断器放行，避免被拒绝的请求白白消耗共享令牌
+                if not breaker.allow():
+                    break
+                if self.rate_limiter is not None and not self.rate_limiter.acquire(timeout=remaining):
+                    breaker.record_neutral()  # 归还可能占用的半开试探名额
+                    raise LLMUnavailableError(f"LLM 限流排队超时（{deadline}s）")
+
+                try:
+                    response = completion(
+                        model=route['model'],
+                        messages=messages,
+                        api_key=route['api_key'],
+                        api_base=route['api_base'],
+                        temperature=temperature,
+                        timeout=min(self.timeout, max(expires - time.monotonic(), 0.1)),
+                        num_retries=0,
+                        max_retries=0,
+                    )
+                except Exception as e:
+                    if not self._is_retryable(e):
+                        # 请求本身有误（如 400/401），既不计入熔断，也不视为链路恢复
+                        breaker.record_neutral()
+                        raise LLMRequestError(str(e)) from e
+                    breaker.record_failure()
+                    last_error = f"{route['model']}: {type(e).__name__}"
+                    print(f"⚠️ LLM 调用失败（{last_error}，第{attempt + 1}次）")
+                    if attempt + 1 < self.max_attempts:
+                        delay = min(self._backoff(attempt), max(expires - time.monotonic(), 0))
+                        if cancel_event is None:
+                            time.sleep(delay)
+                        elif cancel_event.wait(delay):
+                            raise LLMCancelledError("LLM 调用已取消")
+                    continue
+
+                breaker.record_success()
+                return response.choices[0].message.content
+
+        raise LLMUnavailableError(f"LLM 服务不可用：{last_error}")
+
+
+_shared_client = None
+_shared_client_lock = threading.Lock()
+
+
+def get_shared_client():
+    """
+    获取进程内共享的 LLMClient（所有 Streamlit 会话共用同一限流器、熔断器和连接池）
+    """
+    global _shared_client
+    with _shared_client_lock:
+        if _shared_client is None:
+            # LiteLLM 对 OpenAI 兼容接口复用该 httpx 会话，保持 keep-alive 连接
+            litellm.client_session = httpx.Client(
+                limits=httpx.Limits(max_connections=Config.LLM_POOL_SIZE,
+                                    max_keepalive_connections=Config.LLM_POOL_SIZE),
+                timeout=Config.LLM_TIMEOUT,
+            )
+            _shared_client = LLMClient.from_config(
+                rate_limiter=TokenBucket(Config.LLM_RATE_LIMIT, Config.LLM_RATE_BURST)
+            )
+        return _shared_client
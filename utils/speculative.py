@@ -0,0 +1,107 @@
+import threading
+import weakref
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+
+
+class SpeculativeRunner:
+    """
+    预测式后台任务：输入变化后经过去抖等待在后台线程中提前执行任务，
+    更新的输入会取消过期任务。每个实例（每个会话）同时最多只有一个任务，
+    用户真正提交时通过 take() 取回已完成或进行中的结果。
+    """
+
+    IDLE = 'IDLE'
+    PENDING = 'PENDING'  # 去抖等待中
+    RUNNING = 'RUNNING'
+    DONE = 'DONE'
+
+    def __init__(self, debounce=1.0):
+        """
+        :param debounce: 输入稳定多少秒后才开始执行 (s)
+        """
+        self.debounce = debounce
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="speculative")
+        # Streamlit 会话结束时没有回调，随 session_state 被回收时关闭线程池
+        weakref.finalize(self, self._executor.shutdown, wait=False, cancel_futures=True)
+        self._lock = threading.Lock()
+        self._job = None
+        self._consumed_key = None  # 最近一次被 take() 取走的输入，避免立刻重复执行
+
+    def submit(self, key, fn):
+        """
+        为输入 key 提交后台任务；key 与当前任务相同则不做任何事
+
+        :param key: 可比较的输入签名（如起终点、障碍物、安全距离组成的元组）
+        :param fn: 任务函数 fn(cancel_event)，应定期检查 cancel_event 并尽快返回
+        :return: 是否提交了新任务
+        """
+        with self._lock:
+            if self._job is not None and self._job['key'] == key:
+                return False
+            if key == self._consumed_key:
+                return False
+            self._consumed_key = None
+            self._cancel_locked()
+
+            job = {'key': key, 'fn': fn, 'cancel': threading.Event(), 'go': threading.Event(), 'started': False}
+            job['future'] = self._executor.submit(self._run, job)
+            self._job = job
+            return True
+
+    def _run(self, job):
+        # 去抖：等待期间被新的编辑取消则直接放弃；take() 会提前结束等待
+        job['go'].wait(self.debounce)
+        if job['cancel'].is_set():
+            return None
+        job['started'] = True
+        return job['fn'](job['cancel'])
+
+    def _cancel_locked(self):
+        if self._job is not None:
+            self._job['cancel'].set()
+            self._job['go'].set()
+            self._job['future'].cancel()
+            self._job = None
+
+    def cancel(self):
+        """取消当前任务（关闭预测式规划时调用）"""
+        with self._lock:
+            self._cancel_locked()
+            self._consumed_key = None
+
+    def status(self, key):
+        """输入 key 对应任务的状态"""
+        with self._lock:
+            job = self._job
+        if job is None or job['key'] != key:
+            return self.IDLE
+        if job['future'].done():
+            return self.DONE
+        return self.RUNNING if job['started'] else self.PENDING
+
+    def take(self, key, timeout=None):
+        """
+        取走输入 key 对应的结果：已完成则立即返回，进行中则等待其完成；
+        仍排在已取消的旧任务之后（尚未开始）时不再等待，直接在调用线程中执行
+
+        :return: 任务结果；没有对应任务（或任务被取消）时返回 None
+        """
+        with self._lock:
+            job = self._job
+            if job is None or job['key'] != key:
+                return None
+            self._job = None
+            self._consumed_key = key
+
+        if job['future'].cancel():
+            return job['fn'](job['cancel'])
+
+        job['go'].set()
+        try:
+            return job['future'].result(timeout=timeout)
+        except CancelledError:
+            return None
+
+    def shutdown(self):
+        self.cancel()
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,207 @@
+import math
+
+import numpy as np
+
+
+class Path:
+    """
+    航点序列的紧凑表示：坐标存放在形状为 (2, N) 的连续 float64 数组中，
+    x / y 两行各自连续，可直接（零拷贝）交给 Plotly 或验证器使用。
+    与现有的 [{'x': ..., 'y': ...}, ...] JSON 格式可以互相转换。
+    """
+
+    __slots__ = ('_data',)
+
+    def __init__(self, xs=(), ys=()):
+        data = np.empty((2, len(xs)), dtype=np.float64)
+        data[0] = xs
+        data[1] = ys
+        self._data = data
+
+    @classmethod
+    def _wrap(cls, data):
+        path = cls.__new__(cls)
+        path._data = np.ascontiguousarray(data, dtype=np.float64)
+        return path
+
+    @classmethod
+    def from_dicts(cls, waypoints):
+        """从 [{'x': float, 'y': float}, ...] 创建"""
+        n = len(waypoints)
+        data = np.empty((2, n), dtype=np.float64)
+        data[0] = np.fromiter((wp['x'] for wp in waypoints), dtype=np.float64, count=n)
+        data[1] = np.fromiter((wp['y'] for wp in waypoints), dtype=np.float64, count=n)
+        return cls._wrap(data)
+
+    @classmethod
+    def from_points(cls, points):
+        """从 [(x, y), ...] 或形状为 (N, 2) 的数组创建"""
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        return cls._wrap(points.T)
+
+    @classmethod
+    def coerce(cls, waypoints):
+        """接受 Path、dict 列表或点列表，统一转换为 Path"""
+        if isinstance(waypoints, cls):
+            return waypoints
+        if len(waypoints) and isinstance(waypoints[0], dict):
+            return cls.from_dicts(waypoints)
+        return cls.from_points(waypoints)
+
+    def to_dicts(self, ndigits=None):
+        """转换回 [{'x': float, 'y': float}, ...] 格式"""
+        xs, ys = self._data.tolist()
+        if ndigits is not None:
+            return [{'x': round(x, ndigits), 'y': round(y, ndigits)} for x, y in zip(xs, ys)]
+        return [{'x': x, 'y': y} for x, y in zip(xs, ys)]
+
+    @property
+    def x(self):
+        return self._data[0]
+
+    @property
+    def y(self):
+        return self._data[1]
+
+    @property
+    def points(self):
+        """形状为 (N, 2) 的坐标视图（非连续，不拷贝）"""
+        return self._data.T
+
+    def segments(self):
+        """返回 (起点数组, 终点数组)，形状均为 (N-1, 2)"""
+        return self._data[:, :-1].T, self._data[:, 1:].T
+
+    def segment_lengths(self):
+        return np.hypot(np.diff(self._data[0]), np.diff(self._data[1]))
+
+    def length(self):
+        """路径总长度 (m)"""
+        return float(self.segment_lengths().sum())
+
+    def splice(self, start, stop, insert=None):
+        """用 insert（Path 或点列表）替换下标 [start, stop) 的航点，返回新 Path"""
+        parts = [self._data[:, :start]]
+        if insert is not None:
+            parts.append(Path.coerce(insert)._data)
+        parts.append(self._data[:, stop:])
+        return Path._wrap(np.concatenate(parts, axis=1))
+
+    def __len__(self):
+        return self._data.shape[1]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return Path._wrap(self._data[:, index])
+        return float(self._data[0, index]), float(self._data[1, index])
+
+    def __iter__(self):
+        return zip(*self._data.tolist())
+
+    def __eq__(self, other):
+        return isinstance(other, Path) and np.array_equal(self._data, other._data)
+
+    def __repr__(self):
+        return f"Path({len(self)} points)"
+
+
+class Trajectory:
+    """
+    船舶航迹的定长环形缓冲区：超过 capacity 后覆盖最旧的点，内存占用恒定。
+    decimation > 1 时每隔 decimation 个点记录一次（抽稀）。
+    """
+
+    __slots__ = ('_data', '_start', '_size', '_decimation', '_skipped')
+
+    def __init__(self, capacity=5000, decimation=1):
+        self._data = np.empty((2, capacity), dtype=np.float64)
+        self._start = 0
+        self._size = 0
+        self._decimation = max(1, int(decimation))
+        self._skipped = 0
+
+    @property
+    def capacity(self):
+        return self._data.shape[1]
+
+    def clear(self):
+        self._start = 0
+        self._size = 0
+        self._skipped = 0
+
+    def append(self, x, y, force=False):
+        """
+        记录一个航迹点
+
+        :param force: 忽略抽稀间隔，强制记录（如到达航点时）
+        """
+        if not force and self._size:
+            self._skipped += 1
+            if self._skipped < self._decimation:
+                return
+        self._skipped = 0
+
+        capacity = self.capacity
+        if self._size < capacity:
+            slot = (self._start + self._size) % capacity
+            self._size += 1
+        else:
+            slot = self._start
+            self._start = (self._start + 1) % capacity
+        self._data[0, slot] = x
+        self._data[1, slot] = y
+
+    def _ordered(self):
+        end = self._start + self._size
+        if end <= self.capacity:
+            return self._data[:, self._start:end]  # 未回绕：直接返回视图
+        return np.concatenate([self._data[:, self._start:], self._data[:, :end - self.capacity]], axis=1)
+
+    @property
+    def x(self):
+        return self._ordered()[0]
+
+    @property
+    def y(self):
+        return self._ordered()[1]
+
+    def to_path(self):
+        return Path._wrap(self._ordered())
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, index):
+        if not -self._size <= index < self._size:
+            raise IndexError("trajectory index out of range")
+        slot = (self._start + index % self._size) % self.capacity
+        return float(self._data[0, slot]), float(self._data[1, slot])
+
+    def __iter__(self):
+        return zip(*self._ordered().tolist())
+
+    def __repr__(self):
+        return f"Trajectory({self._size}/{self.capacity} points, decimation={self._decimation})"
+
+
+_UNIT_CIRCLE = np.stack([
+    np.cos(np.linspace(0, 2 * math.pi, 51)),
+    np.sin(np.linspace(0, 2 * math.pi, 51)),
+])
+
+
+def circle_outline(cx, cy, radius):
+    """圆形轮廓坐标 (x 数组, y 数组)，单位圆只预计算一次"""
+    return cx + radius * _UNIT_CIRCLE[0], cy + radius * _UNIT_CIRCLE[1]
+
+
+def circles_outline(circles, offset=0.0):
+    """
+    批量圆形轮廓：所有圆的轮廓以 nan 分隔拼接成一组 (x 数组, y 数组)，
+    大量障碍物（如导入的海图）可以用单条 Plotly 轨迹绘制
+    """
+    circles = np.asarray(circles, dtype=np.float64).reshape(-1, 3)
+    radii = (circles[:, 2] + offset)[:, None]
+    xs = np.hstack([circles[:, :1] + radii * _UNIT_CIRCLE[0], np.full((len(circles), 1), np.nan)])
+    ys = np.hstack([circles[:, 1:2] + radii * _UNIT_CIRCLE[1], np.full((len(circles), 1), np.nan)])
+    return xs.ravel(), ys.ravel()
@@ -1,3 +1,11 @@
 from .json_parser import extract_json_from_text
+from .trajectory import Path, Trajectory, circle_outline, circles_outline
+from .speculative import SpeculativeRunner
+from .chart_import import ChartImportError, import_chart
+from .llm_client import (
+    LLMCancelledError, LLMClient, LLMError, LLMRequestError, LLMUnavailableError, get_shared_client
+)
 
-__all__ = ['extract_json_from_text']
+__all__ = ['extract_json_from_text', 'LLMClient', 'LLMError', 'LLMRequestError', 'LLMUnavailableError',
+           'LLMCancelledError', 'get_shared_client', 'Path', 'Trajectory', 'circle_outline', 'circles_outline',
+           'SpeculativeRunner', 'ChartImportError', 'import_chart']